@@ -0,0 +1,14 @@
+from maliba_ai.benchmarks.runner import BenchmarkResult, StepTimer, benchmark_text, results_to_json, run_benchmarks
+from maliba_ai.benchmarks.tiny import build_tiny_audio_tokenizer, build_tiny_lm, build_tiny_models, build_tiny_tokenizer
+
+__all__ = [
+    "BenchmarkResult",
+    "StepTimer",
+    "benchmark_text",
+    "build_tiny_audio_tokenizer",
+    "build_tiny_lm",
+    "build_tiny_models",
+    "build_tiny_tokenizer",
+    "results_to_json",
+    "run_benchmarks",
+]
@@ -0,0 +1,68 @@
+import json
+import torch
+import argparse
+
+from maliba_ai.config.settings import Settings
+from maliba_ai.benchmarks.runner import results_to_json, run_benchmarks
+from maliba_ai.benchmarks.tiny import build_tiny_models
+from maliba_ai.tts.inference import BambaraTTSInference
+from maliba_ai.tts.metrics import Metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Bambara TTS synthesis and report JSON.")
+    parser.add_argument("--tiny", action="store_true", help="use small random models, offline and CPU friendly")
+    parser.add_argument("--model-path", default=Settings.model_repo)
+    parser.add_argument("--device", default=None, help="device of the --tiny models (default: cpu)")
+    parser.add_argument("--text-lengths", type=int, nargs="+", default=[50, 200])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--threads", type=int, nargs="+", default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--max-new-audio-tokens", type=int, default=256)
+    parser.add_argument("--max-seq-length", type=int, default=2048)
+    parser.add_argument("--static-cache", action="store_true")
+    parser.add_argument("--optimize-vocoder", action="store_true")
+    parser.add_argument("--vocoder-chunk-tokens", type=int, default=None)
+    parser.add_argument("--stage-metrics", action="store_true", help="also report the time spent in every synthesis stage")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON file of the results, printed when omitted")
+    args = parser.parse_args()
+
+    options = dict(
+        max_seq_length=args.max_seq_length,
+        static_cache=args.static_cache,
+        optimize_vocoder=args.optimize_vocoder,
+        vocoder_chunk_tokens=args.vocoder_chunk_tokens,
+        metrics=Metrics() if args.stage_metrics else None,
+    )
+    if args.tiny:
+        device = torch.device(args.device or "cpu")
+        model, tokenizer, audio_tokenizer = build_tiny_models(device, seed=args.seed, max_seq_length=args.max_seq_length)
+        tts = BambaraTTSInference.from_components(model, tokenizer, audio_tokenizer, device=device, **options)
+    else:
+        tts = BambaraTTSInference(model_path=args.model_path, detokenize_only=True, **options)
+
+    torch.manual_seed(args.seed)
+    results = run_benchmarks(
+        tts,
+        text_lengths=args.text_lengths,
+        batch_sizes=args.batch_sizes,
+        threads=args.threads,
+        repeats=args.repeats,
+        warmup=args.warmup,
+        max_new_audio_tokens=args.max_new_audio_tokens,
+    )
+    report = results_to_json(tts, results, settings=vars(args))
+    if args.stage_metrics:
+        report["stages"] = options["metrics"].summary()
+    report = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import sys
+import time
+import torch
+import platform
+import statistics
+import transformers
+
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence
+from transformers.generation.streamers import BaseStreamer
+
+from maliba_ai import __version__
+from maliba_ai.config.speakers import Adama, SingleSpeaker
+from maliba_ai.tts.inference import BambaraTTSInference
+
+
+# sentences the benchmark texts are cut from, so prompts look like real requests
+_SAMPLE_TEXT = (
+    "Aw ni ce, i ka kɛnɛ wa? Bamanankan ye kan ye min fɔ bɛ Mali jamana kɔnɔ. "
+    "An bɛ baara kɛ ni kɛnɛya ye, ka dɔnniya jɛnsɛn mɔgɔw cɛ, ka jamana lakana. "
+    "Sini, an bɛna taa sugu la ka nɔnɔ ni malo san, ka segin so su fɛ."
+)
+
+
+def benchmark_text(num_chars: int) -> str:
+    """Bambara text of about `num_chars` characters, cut between words."""
+    if num_chars <= 0:
+        raise ValueError("num_chars should be positive")
+    text = (_SAMPLE_TEXT + " ") * (num_chars // len(_SAMPLE_TEXT) + 1)
+    text = text[:num_chars + 1]
+    return text.rsplit(" ", 1)[0] if " " in text else text[:num_chars]
+
+
+class StepTimer(BaseStreamer):
+    """
+    Streamer recording when `generate` produces each decode step.
+
+    `generate` first puts the prompt, which is skipped, then the tokens of every step; the time
+    of the first step relative to `start()` is the time to first token.
+    """
+
+    def __init__(self):
+        self.start_time = 0.0
+        self.step_times: List[float] = []
+        self._expect_prompt = True
+
+    def start(self) -> None:
+        self.start_time = time.perf_counter()
+        self.step_times = []
+        self._expect_prompt = True
+
+    def put(self, value: torch.Tensor) -> None:
+        if self._expect_prompt:
+            self._expect_prompt = False
+            return
+        self.step_times.append(time.perf_counter())
+
+    def end(self) -> None:
+        self._expect_prompt = True
+
+
+@dataclass
+class BenchmarkResult:
+    """
+    Median measurements of one (text length, batch size, threads) configuration.
+
+    Times are wall-clock; real-time factors are processing seconds per second of audio produced,
+    over the whole batch. Measurements that could not be taken are None.
+    """
+
+    text_chars: int
+    batch_size: int
+    threads: int
+    repeats: int
+    decode_steps: float
+    time_to_first_token_ms: Optional[float]
+    decode_ms_per_token: Optional[float]
+    lm_tokens_per_second: float
+    lm_seconds: float
+    vocoder_seconds: float
+    audio_seconds: float
+    vocoder_rtf: Optional[float]
+    end_to_end_rtf: Optional[float]
+
+
+def _median(values: Sequence[Optional[float]]) -> Optional[float]:
+    """Median of the measured values, None when no run measured anything (e.g. no audio produced)."""
+    values = [value for value in values if value is not None]
+    return statistics.median(values) if values else None
+
+
+def _synchronize(device: torch.device) -> None:
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def _run_once(
+    tts: BambaraTTSInference,
+    texts: Sequence[str],
+    speaker_keys: Sequence[Optional[str]],
+    max_new_audio_tokens: int,
+) -> Dict[str, Optional[float]]:
+    device = tts._device
+    timer = StepTimer()
+
+    _synchronize(device)
+    timer.start()
+    start = timer.start_time
+    audio_tokens = tts._generate_audio_tokens(
+        texts, max_new_audio_tokens=max_new_audio_tokens, speaker_keys=speaker_keys, streamer=timer
+    )
+    _synchronize(device)
+    lm_end = time.perf_counter()
+    waveforms = tts._vocode_audio_tokens(audio_tokens, speaker_keys)
+    _synchronize(device)
+    end = time.perf_counter()
+
+    steps = timer.step_times
+    sample_rate = tts._audio_tokenizer.config.get("sample_rate", 16000)
+    audio_seconds = sum(len(waveform) for waveform in waveforms) / sample_rate
+    lm_seconds = lm_end - start
+    vocoder_seconds = end - lm_end
+    return {
+        "decode_steps": len(steps),
+        "time_to_first_token_ms": 1000 * (steps[0] - start) if steps else None,
+        "decode_ms_per_token": 1000 * (steps[-1] - steps[0]) / (len(steps) - 1) if len(steps) > 1 else None,
+        "lm_tokens_per_second": len(texts) * len(steps) / lm_seconds,
+        "lm_seconds": lm_seconds,
+        "vocoder_seconds": vocoder_seconds,
+        "audio_seconds": audio_seconds,
+        "vocoder_rtf": vocoder_seconds / audio_seconds if audio_seconds else None,
+        "end_to_end_rtf": (end - start) / audio_seconds if audio_seconds else None,
+    }
+
+
+def run_benchmarks(
+    tts: BambaraTTSInference,
+    text_lengths: Sequence[int] = (50, 200),
+    batch_sizes: Sequence[int] = (1, 4),
+    threads: Optional[Sequence[int]] = None,
+    repeats: int = 3,
+    warmup: int = 1,
+    max_new_audio_tokens: int = 256,
+    speaker_id: SingleSpeaker = Adama,
+) -> List[BenchmarkResult]:
+    """
+    Time the LM and vocoder stages of batched synthesis over a grid of configurations.
+
+    Every configuration is run `warmup` times untimed, then `repeats` times, and the medians are
+    reported. Synthesis goes through the same two stages as `generate_speech_batch`.
+
+    Args:
+        tts (BambaraTTSInference): Inference instance to benchmark.
+        text_lengths (Sequence[int]): Characters of the benchmark texts (default: 50 and 200).
+        batch_sizes (Sequence[int]): Texts synthesized per call (default: 1 and 4).
+        threads (Sequence[int], optional): Torch intra-op thread counts, the current one by default.
+        repeats (int): Timed runs per configuration (default: 3).
+        warmup (int): Untimed runs per configuration (default: 1).
+        max_new_audio_tokens (int): Maximum audio tokens generated per text (default: 256).
+        speaker_id (SingleSpeaker): Speaker of the texts (default: Adama).
+
+    Returns:
+        List[BenchmarkResult]: One result per configuration.
+    """
+    if repeats <= 0:
+        raise ValueError("repeats should be positive")
+
+    initial_threads = torch.get_num_threads()
+    threads = list(threads or [initial_threads])
+    results = []
+    try:
+        for num_threads in threads:
+            torch.set_num_threads(num_threads)
+            for text_chars in text_lengths:
+                text = tts._format_text(benchmark_text(text_chars), speaker_id)
+                for batch_size in batch_sizes:
+                    texts = [text] * batch_size
+                    speaker_keys = [speaker_id.id] * batch_size
+                    for _ in range(warmup):
+                        _run_once(tts, texts, speaker_keys, max_new_audio_tokens)
+                    runs = [_run_once(tts, texts, speaker_keys, max_new_audio_tokens) for _ in range(repeats)]
+                    medians = {key: _median([run[key] for run in runs]) for key in runs[0]}
+                    results.append(BenchmarkResult(
+                        text_chars=text_chars,
+                        batch_size=batch_size,
+                        threads=num_threads,
+                        repeats=repeats,
+                        **medians,
+                    ))
+    finally:
+        torch.set_num_threads(initial_threads)
+    return results
+
+
+def environment_info(tts: BambaraTTSInference) -> Dict[str, Any]:
+    """Versions and hardware the benchmarks ran on."""
+    device = tts._device
+    return {
+        "maliba_ai": __version__,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "torch": torch.__version__,
+        "transformers": transformers.__version__,
+        "device": str(device),
+        "device_name": torch.cuda.get_device_name(device) if device.type == "cuda" else platform.processor(),
+        "default_threads": torch.get_num_threads(),
+    }
+
+
+def results_to_json(
+    tts: BambaraTTSInference,
+    results: Sequence[BenchmarkResult],
+    settings: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """JSON serializable report of a benchmark run."""
+    return {
+        "environment": environment_info(tts),
+        "settings": settings or {},
+        "results": [asdict(result) for result in results],
+    }
@@ -0,0 +1,136 @@
+"""
+Description:
+    Small randomly initialized stand-ins of the Spark-TTS models, so that the synthesis pipeline
+    can be benchmarked offline on CPU. They have the real model layouts (BiCodec token rates,
+    32 global tokens, 4096 global and 8192 semantic codes, Qwen2 LM) at a fraction of their width,
+    and produce noise.
+"""
+
+import torch
+
+from typing import Any, Dict, Optional, Tuple
+from tokenizers import Regex, Tokenizer, models, pre_tokenizers
+from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+from maliba_ai.sparktts.models.bicodec import BiCodec
+from maliba_ai.sparktts.models.audio_tokenizer import BiCodecTokenizer
+
+
+# "audio_tokenizer" section of a BiCodec config.yaml, same rates and codebooks as Spark-TTS-0.5B
+TINY_BICODEC_CONFIG: Dict[str, Any] = {
+    "mel_params": dict(
+        sample_rate=16000, n_fft=1024, win_length=640, hop_length=320, mel_fmin=10, mel_fmax=None, num_mels=32
+    ),
+    "encoder": dict(
+        input_channels=32, vocos_dim=32, vocos_intermediate_dim=64, vocos_num_layers=2,
+        out_channels=16, sample_ratios=[1, 1],
+    ),
+    "decoder": dict(input_channel=16, channels=64, rates=[8, 5, 4, 2], kernel_sizes=[16, 11, 8, 4]),
+    "quantizer": dict(input_dim=16, codebook_size=8192, codebook_dim=8, commitment=0.25),
+    "speaker_encoder": dict(
+        input_dim=32, out_dim=16, latent_dim=16, token_num=32, fsq_levels=[4, 4, 4, 4, 4, 4], fsq_num_quantizers=1
+    ),
+    "prenet": dict(
+        input_channels=16, vocos_dim=32, vocos_intermediate_dim=64, vocos_num_layers=2,
+        out_channels=16, condition_dim=16, sample_ratios=[1, 1],
+    ),
+    "postnet": dict(
+        input_channels=16, vocos_dim=32, vocos_intermediate_dim=64, vocos_num_layers=2, out_channels=32
+    ),
+}
+
+# audio settings of the config.yaml of the Spark-TTS model directory
+TINY_AUDIO_CONFIG: Dict[str, Any] = dict(
+    sample_rate=16000, latent_hop_length=320, ref_segment_duration=6, volume_normalize=True
+)
+
+NUM_GLOBAL_CODES = 4 ** 6
+NUM_SEMANTIC_CODES = 8192
+
+SPECIAL_TOKENS = [
+    "<|task_tts|>",
+    "<|start_content|>",
+    "<|end_content|>",
+    "<|start_global_token|>",
+    "<|end_global_token|>",
+    "<|start_semantic_token|>",
+    "<|end_semantic_token|>",
+]
+
+_CHARACTERS = [chr(i) for i in range(32, 127)] + list("ɛɔɲŋƐƆƝŊàèéìòù")
+
+
+def build_tiny_tokenizer() -> PreTrainedTokenizerFast:
+    """Character-level tokenizer holding the Spark-TTS special tokens and every BiCodec token."""
+    vocab = {token: i for i, token in enumerate(["[UNK]"] + _CHARACTERS)}
+    tokenizer = Tokenizer(models.WordLevel(vocab=vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split(Regex("."), behavior="isolated")
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=tokenizer, unk_token="[UNK]", eos_token="<|im_end|>", pad_token="<|endoftext|>"
+    )
+    tokenizer.add_tokens(
+        ["<|endoftext|>", "<|im_end|>"]
+        + SPECIAL_TOKENS
+        + [f"<|bicodec_global_{i}|>" for i in range(NUM_GLOBAL_CODES)]
+        + [f"<|bicodec_semantic_{i}|>" for i in range(NUM_SEMANTIC_CODES)],
+        special_tokens=True,
+    )
+    return tokenizer
+
+
+def build_tiny_lm(
+    tokenizer: PreTrainedTokenizerFast,
+    hidden_size: int = 64,
+    num_layers: int = 2,
+    max_seq_length: int = 2048,
+) -> Qwen2ForCausalLM:
+    """Randomly initialized Qwen2 LM over the vocabulary of `tokenizer`, in eval mode."""
+    config = Qwen2Config(
+        vocab_size=len(tokenizer),
+        hidden_size=hidden_size,
+        num_hidden_layers=num_layers,
+        num_attention_heads=4,
+        num_key_value_heads=2,
+        intermediate_size=2 * hidden_size,
+        max_position_embeddings=max_seq_length,
+        pad_token_id=tokenizer.pad_token_id,
+        eos_token_id=tokenizer.eos_token_id,
+    )
+    return Qwen2ForCausalLM(config).eval()
+
+
+def build_tiny_audio_tokenizer(
+    device: Optional[torch.device] = None,
+    detokenize_only: bool = True,
+) -> BiCodecTokenizer:
+    """Randomly initialized BiCodec wrapped in an audio tokenizer, detokenize-only by default."""
+    model = BiCodec.from_config(TINY_BICODEC_CONFIG, detokenize_only=detokenize_only)
+    return BiCodecTokenizer.from_model(model.eval(), dict(TINY_AUDIO_CONFIG), device=device)
+
+
+def build_tiny_models(
+    device: Optional[torch.device] = None,
+    seed: int = 0,
+    hidden_size: int = 64,
+    num_layers: int = 2,
+    max_seq_length: int = 2048,
+) -> Tuple[Qwen2ForCausalLM, PreTrainedTokenizerFast, BiCodecTokenizer]:
+    """
+    Build the tiny LM, its tokenizer and the tiny audio tokenizer.
+
+    Args:
+        device (torch.device, optional): Device of the models (default: CPU).
+        seed (int): Seed of the random weights (default: 0).
+        hidden_size (int): Hidden size of the LM (default: 64).
+        num_layers (int): Number of LM layers (default: 2).
+        max_seq_length (int): Maximum prompt plus generated tokens of the LM (default: 2048).
+
+    Returns:
+        tuple: (model, tokenizer, audio_tokenizer)
+    """
+    device = device or torch.device("cpu")
+    torch.manual_seed(seed)
+    tokenizer = build_tiny_tokenizer()
+    model = build_tiny_lm(tokenizer, hidden_size, num_layers, max_seq_length).to(device)
+    audio_tokenizer = build_tiny_audio_tokenizer(device)
+    return model, tokenizer, audio_tokenizer
@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import List
+from typing import List, Union
 
 
 class Settings : 
@@ -23,6 +23,23 @@ class SingleSpeaker:
         return f"SingleSpeaker(id='{self.id}')"
 
 
+@dataclass(frozen=True)
+class ClonedVoice:
+    """A voice cloned from reference audio with `BambaraTTSInference.register_voice`."""
+
+    name: str
+
+    @property
+    def id(self) -> str:
+        return self.name
+
+    def __str__(self) -> str:
+        return f"Voice({self.name})"
+
+
+Voice = Union[SingleSpeaker, ClonedVoice]
+
+
 class Speakers:
     Adama: SingleSpeaker     = SingleSpeaker(id="SPEAKER_1")
     Moussa: SingleSpeaker    = SingleSpeaker(id="SPEAKER_2")
@@ -6,6 +6,9 @@ from huggingface_hub import snapshot_download
 from maliba_ai.config.settings import Settings
 from maliba_ai.sparktts.models.audio_tokenizer import BiCodecTokenizer
 
+# files of the Spark-TTS snapshot a detokenize-only audio tokenizer reads, i.e. without wav2vec2 and the LLM
+DETOKENIZE_ONLY_FILES = ["config.yaml", "BiCodec/*"]
+
 def load_tts_model(model_path:str = Settings.model_repo, max_seq_length:int = 2048):
     """
     Load the TTS model and tokenizer from the specified repository.
@@ -27,17 +30,25 @@ def load_tts_model(model_path:str = Settings.model_repo, max_seq_length:int = 20
     return model, tokenizer
 
 
-def load_audio_tokenizer(device):
+def load_audio_tokenizer(device, detokenize_only: bool = False):
     """
     Load the audio tokenizer, downloading the base model if necessary.
     
     Args:
         device (torch.device): Device to load the tokenizer on ('cuda' or 'cpu').
+        detokenize_only (bool): Only build what turns tokens into audio, for TTS inference.
+            Only the BiCodec weights and config.yaml are then downloaded.
     
     Returns:
         BiCodecTokenizer: Loaded audio tokenizer instance.
     """
-    if not os.path.exists("Spark-TTS-0.5B"):
-        snapshot_download(Settings.base_spark_model, local_dir="Spark-TTS-0.5B")
-    audio_tokenizer = BiCodecTokenizer("Spark-TTS-0.5B", device)
+    # a detokenize-only download leaves out wav2vec2, which is fetched when a full tokenizer needs it
+    required = "BiCodec" if detokenize_only else "wav2vec2-large-xlsr-53"
+    if not os.path.exists(os.path.join("Spark-TTS-0.5B", required)):
+        snapshot_download(
+            Settings.base_spark_model,
+            local_dir="Spark-TTS-0.5B",
+            allow_patterns=DETOKENIZE_ONLY_FILES if detokenize_only else None,
+        )
+    audio_tokenizer = BiCodecTokenizer("Spark-TTS-0.5B", device, detokenize_only=detokenize_only)
     return audio_tokenizer
\ No newline at end of file
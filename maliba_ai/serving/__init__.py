@@ -0,0 +1,4 @@
+from maliba_ai.serving.engine import AsyncTTSEngine, TTSRequest
+from maliba_ai.serving.server import TTSHTTPServer
+
+__all__ = ["AsyncTTSEngine", "TTSHTTPServer", "TTSRequest"]
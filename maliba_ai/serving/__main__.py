@@ -0,0 +1,37 @@
+import argparse
+import asyncio
+
+from maliba_ai.config.settings import Settings
+from maliba_ai.serving.engine import AsyncTTSEngine
+from maliba_ai.serving.server import TTSHTTPServer
+from maliba_ai.tts.inference import BambaraTTSInference
+from maliba_ai.tts.metrics import Metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Bambara TTS over HTTP with dynamic batching.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model-path", default=Settings.model_repo)
+    parser.add_argument("--max-batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=20.0)
+    parser.add_argument("--use-speaker-cache", action="store_true")
+    parser.add_argument("--metrics", action="store_true", help="expose stage metrics on /metrics")
+    args = parser.parse_args()
+
+    tts = BambaraTTSInference(
+        model_path=args.model_path,
+        use_speaker_cache=args.use_speaker_cache,
+        metrics=Metrics() if args.metrics else None,
+    )
+    engine = AsyncTTSEngine(tts, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+    server = TTSHTTPServer(engine, host=args.host, port=args.port)
+    print(f"Serving Bambara TTS on http://{args.host}:{args.port}/tts")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
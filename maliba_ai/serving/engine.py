@@ -0,0 +1,253 @@
+import time
+import asyncio
+import numpy as np
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Dict, List, Optional, Set, Tuple
+
+from maliba_ai.config.speakers import Adama
+from maliba_ai.config.settings import Voice
+from maliba_ai.tts.inference import BambaraTTSInference
+
+
+@dataclass(eq=False)
+class TTSRequest:
+    """A pending synthesis request and the future its waveform is delivered to."""
+
+    text: str
+    speaker_key: Optional[str]
+    temperature: float
+    top_k: int
+    top_p: float
+    max_new_audio_tokens: int
+    future: asyncio.Future
+    arrival: float = field(default_factory=time.monotonic)
+
+    @property
+    def batch_key(self) -> Tuple[float, int, float, int]:
+        """Requests can share a `generate` call only if they use the same generation parameters."""
+        return (self.temperature, self.top_k, self.top_p, self.max_new_audio_tokens)
+
+
+class AsyncTTSEngine:
+    """
+    Asyncio front-end batching concurrent requests onto a `BambaraTTSInference` instance.
+
+    Requests are queued and grouped into batches by a dynamic batcher: a batch is closed once it
+    holds `max_batch_size` requests or `max_wait_ms` after its first request arrived. Batches then
+    go through two pipeline stages, each on its own worker thread: LM generation of the BiCodec
+    tokens, then vocoding. While a batch is vocoded the LM already samples the next one.
+
+    Example:
+        engine = AsyncTTSEngine(BambaraTTSInference())
+        async with engine:
+            waveform = await engine.synthesize("I ni ce", Speakers.Adama)
+    """
+
+    def __init__(
+        self,
+        tts: BambaraTTSInference,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        max_pending_batches: int = 2,
+    ):
+        """
+        Args:
+            tts (BambaraTTSInference): Loaded inference instance, used by the engine only.
+            max_batch_size (int): Maximum requests per `generate` call (default: 8).
+            max_wait_ms (float): Time a batch waits for more requests after its first one (default: 20).
+            max_pending_batches (int): Batches buffered between two pipeline stages (default: 2).
+        """
+        if max_batch_size <= 0:
+            raise ValueError("max_batch_size should be positive")
+
+        if max_wait_ms < 0:
+            raise ValueError("max_wait_ms can not be negative")
+
+        self.tts = tts
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_pending_batches = max_pending_batches
+
+        self._requests: Optional[asyncio.Queue] = None
+        self._lm_batches: Optional[asyncio.Queue] = None
+        self._vocoder_batches: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[TTSRequest] = set()
+        self._lm_executor: Optional[ThreadPoolExecutor] = None
+        self._vocoder_executor: Optional[ThreadPoolExecutor] = None
+
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+
+    @property
+    def sample_rate(self) -> int:
+        return self.tts._audio_tokenizer.config.get("sample_rate", 16000)
+
+
+    async def start(self) -> None:
+        """Start the batcher and the pipeline stages on the running event loop."""
+        if self.running:
+            return
+        self._requests = asyncio.Queue()
+        self._lm_batches = asyncio.Queue(maxsize=self.max_pending_batches)
+        self._vocoder_batches = asyncio.Queue(maxsize=self.max_pending_batches)
+        self._lm_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-lm")
+        self._vocoder_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts-vocoder")
+        self._tasks = [
+            asyncio.create_task(self._batch_loop()),
+            asyncio.create_task(self._lm_loop()),
+            asyncio.create_task(self._vocoder_loop()),
+        ]
+
+
+    async def stop(self) -> None:
+        """Stop the engine, failing the requests that are still pending."""
+        if not self.running:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        for request in list(self._pending):
+            self._fail(request, RuntimeError("the TTS engine was stopped"))
+
+        # waiting for the in-flight LM and vocoder calls must not block the event loop
+        loop = asyncio.get_running_loop()
+        for executor in (self._lm_executor, self._vocoder_executor):
+            await loop.run_in_executor(None, partial(executor.shutdown, wait=True))
+
+
+    async def __aenter__(self) -> "AsyncTTSEngine":
+        await self.start()
+        return self
+
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.stop()
+
+
+    async def synthesize(
+        self,
+        text: str,
+        speaker_id: Optional[Voice] = Adama,
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+    ) -> np.ndarray:
+        """
+        Queue a request and wait for its waveform.
+
+        Args:
+            text (str): Input text in Bambara to convert to speech.
+            speaker_id (Voice, optional): Speaker or cloned voice to use (default: Adama).
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate (default: 2048).
+
+        Returns:
+            np.ndarray: Generated waveform, empty when no audio tokens were produced.
+        """
+        if not self.running:
+            raise RuntimeError("the TTS engine is not running, call start() first")
+
+        request = TTSRequest(
+            text=self.tts._format_text(text, speaker_id),
+            speaker_key=speaker_id.id if speaker_id else None,
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            max_new_audio_tokens=max_new_audio_tokens,
+            future=asyncio.get_running_loop().create_future(),
+        )
+        self._pending.add(request)
+        request.future.add_done_callback(lambda _: self._pending.discard(request))
+        await self._requests.put(request)
+        return await request.future
+
+
+    async def _collect_window(self) -> List[TTSRequest]:
+        """Wait for a request, then gather the ones arriving within `max_wait` of it."""
+        window = [await self._requests.get()]
+        deadline = window[0].arrival + self.max_wait
+        while len(window) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                window.append(await asyncio.wait_for(self._requests.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        # requests that arrived meanwhile join the window as long as it has room
+        while len(window) < self.max_batch_size and not self._requests.empty():
+            window.append(self._requests.get_nowait())
+        return window
+
+
+    async def _batch_loop(self) -> None:
+        while True:
+            window = await self._collect_window()
+            groups: Dict[Tuple[float, int, float, int], List[TTSRequest]] = {}
+            for request in window:
+                if not request.future.cancelled():
+                    groups.setdefault(request.batch_key, []).append(request)
+            for batch in groups.values():
+                await self._lm_batches.put(batch)
+
+
+    async def _lm_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._lm_batches.get()
+            first = batch[0]
+            try:
+                audio_tokens = await loop.run_in_executor(
+                    self._lm_executor,
+                    lambda: self.tts._generate_audio_tokens(
+                        [request.text for request in batch],
+                        temperature=first.temperature,
+                        top_k=first.top_k,
+                        top_p=first.top_p,
+                        max_new_audio_tokens=first.max_new_audio_tokens,
+                        speaker_keys=[request.speaker_key for request in batch],
+                    ),
+                )
+            except Exception as error:
+                for request in batch:
+                    self._fail(request, error)
+                continue
+            await self._vocoder_batches.put((batch, audio_tokens))
+
+
+    async def _vocoder_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch, audio_tokens = await self._vocoder_batches.get()
+            try:
+                waveforms = await loop.run_in_executor(
+                    self._vocoder_executor,
+                    self.tts._vocode_audio_tokens,
+                    audio_tokens,
+                    [request.speaker_key for request in batch],
+                )
+            except Exception as error:
+                for request in batch:
+                    self._fail(request, error)
+                continue
+            for request, waveform in zip(batch, waveforms):
+                if not request.future.done():
+                    request.future.set_result(waveform)
+
+
+    @staticmethod
+    def _fail(request: TTSRequest, error: BaseException) -> None:
+        if not request.future.done():
+            request.future.set_exception(error)
@@ -0,0 +1,149 @@
+import io
+import json
+import asyncio
+import soundfile as sf
+
+from typing import Dict, Optional, Tuple
+
+from maliba_ai.config.speakers import SingleSpeaker
+from maliba_ai.config.settings import ClonedVoice, Speakers, Voice
+from maliba_ai.serving.engine import AsyncTTSEngine
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class TTSHTTPServer:
+    """
+    Minimal HTTP/1.1 front-end of an `AsyncTTSEngine`, meant for local use and load testing.
+
+    Routes:
+        GET  /health  ->  {"status": "ok"}
+        GET  /metrics ->  stage metrics in the Prometheus text format, when the TTS instance
+                          was created with `metrics`
+        POST /tts     ->  audio/wav, from a JSON body such as
+                          {"text": "I ni ce", "speaker": "Adama", "temperature": 0.8,
+                           "top_k": 50, "top_p": 1.0, "max_new_audio_tokens": 2048}
+
+    "speaker" is a built-in speaker name, a SPEAKER_n ID or the name of a registered voice.
+
+    Every connection serves a single request.
+    """
+
+    def __init__(self, engine: AsyncTTSEngine, host: str = "127.0.0.1", port: int = 8000):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+
+    async def start(self) -> None:
+        await self.engine.start()
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await self.engine.stop()
+
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+
+    @staticmethod
+    async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        method, path, _ = request_line.split(" ", 2)
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1").strip()
+            if not line:
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get("content-length", 0)))
+        return method, path, headers, body
+
+
+    @staticmethod
+    def _response(status: int, body: bytes, content_type: str) -> bytes:
+        head = (
+            f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        return head.encode("latin-1") + body
+
+
+    @classmethod
+    def _json_response(cls, status: int, payload: dict) -> bytes:
+        return cls._response(status, json.dumps(payload).encode("utf-8"), "application/json")
+
+
+    def _resolve_speaker(self, speaker: str) -> Voice:
+        if speaker.startswith("SPEAKER_"):
+            return SingleSpeaker(speaker)
+        if any(voice.name == speaker for voice in self.engine.tts.registered_voices()):
+            return ClonedVoice(speaker)
+        return Speakers.get_speaker_by_name(speaker)
+
+
+    async def _synthesize(self, body: bytes) -> bytes:
+        try:
+            params = json.loads(body or b"{}")
+            if not isinstance(params, dict):
+                raise ValueError("the request body should be a JSON object")
+            speaker = params.get("speaker", "Adama")
+            speaker_id = self._resolve_speaker(speaker)
+            waveform = await self.engine.synthesize(
+                params.get("text"),
+                speaker_id=speaker_id,
+                temperature=float(params.get("temperature", 0.8)),
+                top_k=int(params.get("top_k", 50)),
+                top_p=float(params.get("top_p", 1.0)),
+                max_new_audio_tokens=int(params.get("max_new_audio_tokens", 2048)),
+            )
+        except (ValueError, TypeError, AttributeError) as error:
+            return self._json_response(400, {"error": str(error)})
+
+        buffer = io.BytesIO()
+        sf.write(buffer, waveform, self.engine.sample_rate, format="WAV")
+        return self._response(200, buffer.getvalue(), "audio/wav")
+
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, _, body = await self._read_request(reader)
+            except (ValueError, asyncio.IncompleteReadError):
+                writer.write(self._json_response(400, {"error": "malformed HTTP request"}))
+                return
+
+            if path == "/health":
+                response = self._json_response(200, {"status": "ok"})
+            elif path == "/metrics" and self.engine.tts._metrics.enabled:
+                response = self._response(200, self.engine.tts._metrics.expose().encode("utf-8"), "text/plain; version=0.0.4")
+            elif path != "/tts":
+                response = self._json_response(404, {"error": f"unknown path {path}"})
+            elif method != "POST":
+                response = self._json_response(405, {"error": "use POST"})
+            else:
+                try:
+                    response = await self._synthesize(body)
+                except Exception as error:
+                    response = self._json_response(500, {"error": str(error)})
+            writer.write(response)
+        finally:
+            try:
+                await writer.drain()
+            finally:
+                writer.close()
@@ -17,42 +17,109 @@
 import torch
 import numpy as np
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 from transformers import Wav2Vec2FeatureExtractor, Wav2Vec2Model
 
 from maliba_ai.sparktts.utils.file import load_config
-from maliba_ai.sparktts.utils.audio import load_audio
-from maliba_ai.sparktts.models.bicodec import BiCodec
+from maliba_ai.sparktts.utils.audio import audio_length, load_audio
+from maliba_ai.sparktts.models.bicodec import BiCodec, PreparedSpeaker
+
+
+# wav2vec2 hidden states averaged into the BiCodec encoder input
+WAV2VEC2_FEATURE_LAYERS = (11, 14, 16)
 
 
 class BiCodecTokenizer:
     """BiCodec tokenizer for handling audio input and tokenization."""
 
-    def __init__(self, model_dir: Path, device: torch.device = None, **kwargs):
+    def __init__(
+        self,
+        model_dir: Path,
+        device: torch.device = None,
+        detokenize_only: bool = False,
+        truncate_wav2vec2: bool = True,
+        **kwargs,
+    ):
         super().__init__()
         """
         Args:
             model_dir: Path to the model directory.
             device: Device to run the model on (default is GPU if available).
+            detokenize_only: Only build the BiCodec modules needed to turn tokens into audio.
+            truncate_wav2vec2: Drop the wav2vec2 layers above the last one used as feature,
+                and only keep the needed hidden states while running it.
         """
         self.device = device
         self.model_dir = model_dir
+        self.detokenize_only = detokenize_only
+        self.truncate_wav2vec2 = truncate_wav2vec2
         self.config = load_config(f"{model_dir}/config.yaml")
+        self._processor = None
+        self._feature_extractor = None
         self._initialize_model()
 
+    @classmethod
+    def from_model(
+        cls,
+        model: BiCodec,
+        config: Dict[str, Any],
+        device: torch.device = None,
+        model_dir: Optional[Path] = None,
+    ) -> "BiCodecTokenizer":
+        """
+        Wrap an already built BiCodec model, e.g. a randomly initialized one for benchmarks.
+
+        Args:
+            model: BiCodec model.
+            config: Audio settings normally read from the config.yaml of the model directory
+                (sample_rate, ref_segment_duration, latent_hop_length, volume_normalize).
+            device: Device to run the model on.
+            model_dir: Model directory the wav2vec2 stack is loaded from, only needed to tokenize.
+        """
+        tokenizer = cls.__new__(cls)
+        tokenizer.device = device
+        tokenizer.model_dir = model_dir
+        tokenizer.detokenize_only = model.encoder is None
+        tokenizer.truncate_wav2vec2 = True
+        tokenizer.config = config
+        tokenizer._processor = None
+        tokenizer._feature_extractor = None
+        tokenizer.model = model.to(device)
+        return tokenizer
+
     def _initialize_model(self):
-        """Load and initialize the BiCodec model and Wav2Vec2 feature extractor."""
-        self.model = BiCodec.load_from_checkpoint(f"{self.model_dir}/BiCodec").to(
-            self.device
-        )
-        self.processor = Wav2Vec2FeatureExtractor.from_pretrained(
-            f"{self.model_dir}/wav2vec2-large-xlsr-53"
-        )
-        self.feature_extractor = Wav2Vec2Model.from_pretrained(
-            f"{self.model_dir}/wav2vec2-large-xlsr-53"
+        """Load and initialize the BiCodec model, the Wav2Vec2 stack is loaded on first use."""
+        self.model = BiCodec.load_from_checkpoint(
+            f"{self.model_dir}/BiCodec", detokenize_only=self.detokenize_only
         ).to(self.device)
-        self.feature_extractor.config.output_hidden_states = True
+
+    @property
+    def processor(self) -> Wav2Vec2FeatureExtractor:
+        """Wav2Vec2 feature extractor, only needed to tokenize audio."""
+        if self._processor is None:
+            self._processor = Wav2Vec2FeatureExtractor.from_pretrained(
+                f"{self.model_dir}/wav2vec2-large-xlsr-53"
+            )
+        return self._processor
+
+    @property
+    def feature_extractor(self) -> Wav2Vec2Model:
+        """Wav2Vec2 model, only needed to tokenize audio."""
+        if self._feature_extractor is None:
+            feature_extractor = Wav2Vec2Model.from_pretrained(
+                f"{self.model_dir}/wav2vec2-large-xlsr-53"
+            )
+            if self.truncate_wav2vec2:
+                num_layers = max(WAV2VEC2_FEATURE_LAYERS)
+                del feature_extractor.encoder.layers[num_layers:]
+                feature_extractor.config.num_hidden_layers = num_layers
+            else:
+                feature_extractor.config.output_hidden_states = True
+            self._feature_extractor = feature_extractor.to(self.device)
+        return self._feature_extractor
 
     def get_ref_clip(self, wav: np.ndarray) -> np.ndarray:
         """Get reference audio clip for speaker embedding."""
@@ -91,13 +158,88 @@ class BiCodecTokenizer:
             padding=True,
             output_hidden_states=True,
         ).input_values
+        if self.truncate_wav2vec2:
+            return self._truncated_wav2vec2_features(inputs.to(self.feature_extractor.device))
+
         feat = self.feature_extractor(inputs.to(self.feature_extractor.device))
-        feats_mix = (
-            feat.hidden_states[11] + feat.hidden_states[14] + feat.hidden_states[16]
-        ) / 3
+        feats_mix = sum(feat.hidden_states[layer] for layer in WAV2VEC2_FEATURE_LAYERS) / len(WAV2VEC2_FEATURE_LAYERS)
 
         return feats_mix
 
+    def _truncated_wav2vec2_features(
+        self, input_values: torch.Tensor, attention_mask: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        """run wav2vec2 up to the last feature layer, summing the feature layers as they are produced
+
+        Args:
+            input_values: normalized audio. shape: (batch_size, num_samples)
+            attention_mask: 1 for samples, 0 for padding. shape: (batch_size, num_samples)
+
+        Returns:
+            feats_mix: mean of the feature layers. shape: (batch_size, num_frames, hidden_size)
+        """
+        model = self.feature_extractor
+        encoder = model.encoder
+        with torch.no_grad():
+            extract_features = model.feature_extractor(input_values).transpose(1, 2)
+            hidden_states, _ = model.feature_projection(extract_features)
+
+            layer_attention_mask = None
+            if attention_mask is not None:
+                frame_mask = model._get_feature_vector_attention_mask(hidden_states.shape[1], attention_mask)
+                hidden_states = hidden_states.masked_fill(~frame_mask.unsqueeze(-1), 0.0)
+                # additive mask of shape (batch_size, 1, num_frames, num_frames), hiding padded frames
+                layer_attention_mask = (~frame_mask[:, None, None, :]).to(hidden_states.dtype)
+                layer_attention_mask = layer_attention_mask * torch.finfo(hidden_states.dtype).min
+                layer_attention_mask = layer_attention_mask.expand(-1, 1, hidden_states.shape[1], -1)
+
+            hidden_states = hidden_states + encoder.pos_conv_embed(hidden_states)
+            if not model.config.do_stable_layer_norm:
+                hidden_states = encoder.layer_norm(hidden_states)
+            hidden_states = encoder.dropout(hidden_states)
+
+            # hidden_states[i] of the full model is the output of the i-th layer
+            feats_mix = torch.zeros_like(hidden_states)
+            for index, layer in enumerate(encoder.layers[: max(WAV2VEC2_FEATURE_LAYERS)], start=1):
+                layer_outputs = layer(hidden_states, attention_mask=layer_attention_mask)
+                hidden_states = layer_outputs[0] if isinstance(layer_outputs, tuple) else layer_outputs
+                if index in WAV2VEC2_FEATURE_LAYERS:
+                    feats_mix += hidden_states
+
+        return feats_mix / len(WAV2VEC2_FEATURE_LAYERS)
+
+    def extract_padded_wav2vec2_features(self, wavs: Sequence[np.ndarray]) -> Tuple[torch.Tensor, torch.Tensor]:
+        """extract wav2vec2 features of clips of different lengths in one padded pass
+
+        Args:
+            wavs: audio clips
+
+        Returns:
+            feats_mix: features, zero on padded frames. shape: (batch_size, num_frames, hidden_size)
+            frame_lengths: number of valid frames of each clip. shape: (batch_size,)
+        """
+        inputs = self.processor(
+            list(wavs),
+            sampling_rate=16000,
+            return_tensors="pt",
+            padding=True,
+            return_attention_mask=True,
+        )
+        device = self.feature_extractor.device
+        input_values = inputs.input_values.to(device)
+        attention_mask = inputs.attention_mask.to(device)
+
+        if self.truncate_wav2vec2:
+            feats_mix = self._truncated_wav2vec2_features(input_values, attention_mask)
+        else:
+            with torch.no_grad():
+                feat = self.feature_extractor(input_values, attention_mask=attention_mask)
+            feats_mix = sum(feat.hidden_states[layer] for layer in WAV2VEC2_FEATURE_LAYERS) / len(WAV2VEC2_FEATURE_LAYERS)
+
+        frame_lengths = self.feature_extractor._get_feat_extract_output_lengths(attention_mask.sum(-1))
+        frame_mask = torch.arange(feats_mix.shape[1], device=device)[None, :] < frame_lengths[:, None]
+        return feats_mix * frame_mask.unsqueeze(-1), frame_lengths
+
     def tokenize_batch(self, batch: Dict[str, Any]) -> torch.Tensor:
         """tokenize the batch of audio
 
@@ -129,22 +271,145 @@ class BiCodecTokenizer:
 
         return global_tokens, semantic_tokens
 
+    def tokenize_speaker(self, audio_path: str) -> torch.Tensor:
+        """tokenize the reference clip of an audio file into global tokens only
+
+        Returns:
+            global_tokens: global tokens. shape: (1, 1, global_dim)
+        """
+        _, ref_wav = self.process_audio(audio_path)
+        return self.model.tokenize_speaker(ref_wav.to(self.device))
+
+    def tokenize_files(
+        self,
+        paths: Sequence[str],
+        batch_seconds: float = 60.0,
+        num_workers: int = 4,
+    ) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        """tokenize many audio files, batching clips of similar duration
+
+        Durations are read from the file headers, and the files are sorted by duration and grouped
+        into batches holding at most `batch_seconds` of padded audio, so little compute is spent on
+        padding. Each batch is decoded and resampled on a thread pool while the previous one is
+        encoded, so at most two batches of audio are held in memory whatever the number of files.
+        Tokens of each file are trimmed to its true length.
+
+        Args:
+            paths: audio files
+            batch_seconds: padded audio duration per batch, in seconds
+            num_workers: threads decoding the audio files
+
+        Returns:
+            tokens: one (global_tokens, semantic_tokens) pair per path, shaped like the output of `tokenize`.
+                global_tokens shape: (1, 1, global_dim), semantic_tokens shape: (1, seq_len)
+        """
+        if batch_seconds <= 0:
+            raise ValueError("batch_seconds should be positive")
+
+        sample_rate = self.config["sample_rate"]
+        budget = batch_seconds * sample_rate
+        results: List[Optional[Tuple[torch.Tensor, torch.Tensor]]] = [None] * len(paths)
+        with ThreadPoolExecutor(max_workers=num_workers) as executor:
+            lengths = list(executor.map(partial(audio_length, sampling_rate=sample_rate), paths))
+
+            order = sorted(range(len(paths)), key=lambda i: lengths[i])
+            buckets, bucket = [], []
+            for i in order:
+                # clips are sorted, so the current one is the longest of the bucket
+                if bucket and (len(bucket) + 1) * lengths[i] > budget:
+                    buckets.append(bucket)
+                    bucket = []
+                bucket.append(i)
+            if bucket:
+                buckets.append(bucket)
+
+            def decode(bucket: List[int]):
+                return executor.map(self.process_audio, [paths[i] for i in bucket])
+
+            pending = decode(buckets[0]) if buckets else None
+            for index, bucket in enumerate(buckets):
+                clips = list(pending)
+                if index + 1 < len(buckets):
+                    pending = decode(buckets[index + 1])
+
+                feats, frame_lengths = self.extract_padded_wav2vec2_features([wav for wav, _ in clips])
+                batch = {
+                    "feat": feats.to(self.device),
+                    "feat_lengths": frame_lengths.to(self.device),
+                    "ref_wav": torch.cat([ref_wav for _, ref_wav in clips]).to(self.device),
+                }
+                semantic_tokens, global_tokens = self.model.tokenize(batch)
+                token_lengths = self.model.encoder.output_lengths(frame_lengths)
+                for row, (i, length) in enumerate(zip(bucket, token_lengths.tolist())):
+                    results[i] = (global_tokens[row : row + 1], semantic_tokens[row : row + 1, :length])
+
+        return results
+
+    def prepare_speaker(
+        self, global_tokens: torch.Tensor, d_vector: Optional[torch.Tensor] = None
+    ) -> PreparedSpeaker:
+        """precompute the decoder conditioning of a speaker
+
+        Args:
+            global_tokens: global tokens. shape: (batch_size, global_dim)
+            d_vector: speaker embedding of the global tokens, if already known. shape: (batch_size, out_dim)
+
+        Returns:
+            prepared_speaker: conditioning reusable across detokenize calls
+        """
+        return self.model.prepare_speaker(global_tokens.unsqueeze(1), d_vector=d_vector)
+
     def detokenize(
-        self, global_tokens: torch.Tensor, semantic_tokens: torch.Tensor
+        self,
+        global_tokens: torch.Tensor,
+        semantic_tokens: torch.Tensor,
+        prepared_speaker: Optional[PreparedSpeaker] = None,
+        chunk_tokens: Optional[int] = None,
     ) -> np.array:
         """detokenize the tokens to waveform
 
         Args:
             global_tokens: global tokens. shape: (batch_size, global_dim)
             semantic_tokens: semantic tokens. shape: (batch_size, latent_dim)
+            prepared_speaker: conditioning from `prepare_speaker`, used instead of the global tokens
+            chunk_tokens: vocode in overlapping windows of this many tokens to bound memory
 
         Returns:
             wav_rec: waveform. shape: (batch_size, seq_len) for batch or (seq_len,) for single
         """
         global_tokens = global_tokens.unsqueeze(1)
-        wav_rec = self.model.detokenize(semantic_tokens, global_tokens)
+        wav_rec = self.model.detokenize(
+            semantic_tokens, global_tokens, prepared_speaker=prepared_speaker, chunk_tokens=chunk_tokens
+        )
         return wav_rec.detach().squeeze().cpu().numpy()
 
+    def detokenize_batch(
+        self,
+        global_tokens: torch.Tensor,
+        semantic_tokens: torch.Tensor,
+        lengths: Sequence[int],
+        prepared_speaker: Optional[PreparedSpeaker] = None,
+        chunk_tokens: Optional[int] = None,
+    ) -> List[np.ndarray]:
+        """detokenize a right-padded batch of tokens in a single vocoder pass
+
+        Args:
+            global_tokens: global tokens. shape: (batch_size, global_dim)
+            semantic_tokens: right-padded semantic tokens. shape: (batch_size, max_len)
+            lengths: number of valid semantic tokens of each item
+            prepared_speaker: conditioning from `prepare_speaker`, used instead of the global tokens
+            chunk_tokens: vocode in overlapping windows of this many tokens to bound memory
+
+        Returns:
+            wav_recs: one waveform per item, trimmed to its true length and equal to the output of
+                `detokenize` on the item alone
+        """
+        global_tokens = global_tokens.unsqueeze(1)
+        wav_recs = self.model.detokenize_padded(
+            semantic_tokens, lengths, global_tokens, prepared_speaker=prepared_speaker, chunk_tokens=chunk_tokens
+        )
+        return [wav_rec.detach().squeeze(0).cpu().numpy() for wav_rec in wav_recs]
+
 
 # test
 if __name__ == "__main__":
@@ -17,7 +17,7 @@
 import torch
 import torch.nn as nn
 
-from typing import Tuple
+from typing import Dict, Sequence, Tuple
 from torch.nn.utils import weight_norm, remove_weight_norm
 
 from typing import Optional
@@ -83,6 +83,81 @@ class ConvNeXtBlock(nn.Module):
         x = residual + x
         return x
 
+    def forward_time_major(
+        self, x: torch.Tensor, cond_embedding_id: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        """Same as `forward`, on a (B, T, C) input and without any transpose."""
+        residual = x
+        x = conv1d_time_major(x, self.dwconv)
+        if self.adanorm:
+            assert cond_embedding_id is not None
+            x = self.norm(x, cond_embedding_id)
+        else:
+            x = self.norm(x)
+        x = self.pwconv1(x)
+        x = self.act(x)
+        x = self.pwconv2(x)
+        if self.gamma is not None:
+            x = self.gamma * x
+
+        x = residual + x
+        return x
+
+    @torch.no_grad()
+    def fold_for_inference(self) -> None:
+        """
+        Fold the layer scale into `pwconv2` and, with a plain LayerNorm, the norm affine
+        parameters into `pwconv1`. The block output is unchanged.
+        """
+        if self.gamma is not None:
+            self.pwconv2.weight.mul_(self.gamma[:, None])
+            self.pwconv2.bias.mul_(self.gamma)
+            self.gamma = None
+
+        if isinstance(self.norm, nn.LayerNorm) and self.norm.elementwise_affine:
+            self.pwconv1.bias.add_(self.pwconv1.weight @ self.norm.bias)
+            self.pwconv1.weight.mul_(self.norm.weight[None, :])
+            self.norm = nn.LayerNorm(
+                self.norm.normalized_shape, eps=self.norm.eps, elementwise_affine=False
+            ).to(self.pwconv1.weight.device)
+
+
+def conv1d_time_major(x: torch.Tensor, conv: nn.Conv1d) -> torch.Tensor:
+    """
+    Apply a Conv1d to a time-major (B, T, C) tensor, returning a time-major (B, T, C_out) tensor.
+
+    A contiguous (B, T, C) tensor has the memory layout of a channels-last (B, C, 1, T) image,
+    so the conv runs as a 2D conv on a view of it, without copying the input or the output.
+    """
+    weight = conv.weight.unsqueeze(2)
+    x = nn.functional.conv2d(
+        x.transpose(1, 2).unsqueeze(2),
+        weight,
+        conv.bias,
+        stride=(1, conv.stride[0]),
+        padding=(0, conv.padding[0]),
+        dilation=(1, conv.dilation[0]),
+        groups=conv.groups,
+    )
+    return x.squeeze(2).transpose(1, 2)
+
+
+def set_time_major(module: nn.Module, enabled: bool = True) -> int:
+    """
+    Switch the backbones of a module, and the encoders and decoders wrapping them, between the
+    default channel-first execution and the time-major one, which keeps activations in a single
+    (B, T, C) layout end to end. Both give the same outputs.
+
+    Returns:
+        int: Number of switched modules.
+    """
+    count = 0
+    for child in module.modules():
+        if hasattr(child, "time_major"):
+            child.time_major = enabled
+            count += 1
+    return count
+
 
 class AdaLayerNorm(nn.Module):
     """
@@ -102,14 +177,52 @@ class AdaLayerNorm(nn.Module):
         torch.nn.init.ones_(self.scale.weight)
         torch.nn.init.zeros_(self.shift.weight)
 
+    def scale_shift(self, cond_embedding: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Compute the (B, 1, C) scale and shift applied for a condition embedding."""
+        return self.scale(cond_embedding).unsqueeze(1), self.shift(cond_embedding).unsqueeze(1)
+
     def forward(self, x: torch.Tensor, cond_embedding: torch.Tensor) -> torch.Tensor:
-        scale = self.scale(cond_embedding)
-        shift = self.shift(cond_embedding)
+        if isinstance(cond_embedding, PreparedCondition):
+            scale, shift = cond_embedding[self]
+        else:
+            scale, shift = self.scale_shift(cond_embedding)
         x = nn.functional.layer_norm(x, (self.dim,), eps=self.eps)
-        x = x * scale.unsqueeze(1) + shift.unsqueeze(1)
+        x = x * scale + shift
         return x
 
 
+class PreparedCondition:
+    """
+    Condition embedding with the scale and shift of every AdaLayerNorm of a module precomputed.
+
+    It can be passed wherever a condition tensor is expected; each AdaLayerNorm then looks its
+    own scale and shift up instead of recomputing them from the embedding.
+
+    Args:
+        module (nn.Module): Module whose AdaLayerNorm layers will receive the condition.
+        cond_embedding (Tensor): Condition embedding of shape (B, condition_dim).
+    """
+
+    def __init__(self, module: nn.Module, cond_embedding: torch.Tensor):
+        self.embedding = cond_embedding
+        self._scale_shift: Dict[AdaLayerNorm, Tuple[torch.Tensor, torch.Tensor]] = {
+            m: m.scale_shift(cond_embedding) for m in module.modules() if isinstance(m, AdaLayerNorm)
+        }
+
+    def __getitem__(self, norm: AdaLayerNorm) -> Tuple[torch.Tensor, torch.Tensor]:
+        return self._scale_shift[norm]
+
+    def select(self, rows: Sequence[int]) -> "PreparedCondition":
+        """Condition of a subset of the batch rows, without recomputing the scales and shifts."""
+        index = torch.as_tensor(rows, device=self.embedding.device)
+        selected = PreparedCondition.__new__(PreparedCondition)
+        selected.embedding = self.embedding[index]
+        selected._scale_shift = {
+            norm: (scale[index], shift[index]) for norm, (scale, shift) in self._scale_shift.items()
+        }
+        return selected
+
+
 class ResBlock1(nn.Module):
     """
     ResBlock adapted from HiFi-GAN V1 (https://github.com/jik876/hifi-gan) with dilated 1D convolutions,
@@ -270,6 +383,28 @@ class Backbone(nn.Module):
         raise NotImplementedError("Subclasses must implement the forward method.")
 
 
+def mask_padding(x: torch.Tensor, lengths: Optional[torch.Tensor], time_dim: int = -1) -> torch.Tensor:
+    """
+    Zero the padded frames of a batch, so that convolutions see the same zero padding
+    at the end of every sequence as when it is processed alone.
+
+    Args:
+        x (Tensor): Batch of sequences, time along `time_dim`.
+        lengths (Tensor, optional): Number of valid frames of each sequence, shape (B,).
+            Nothing is masked when None.
+        time_dim (int): Time dimension of `x`.
+
+    Returns:
+        Tensor: `x` with the frames past each length set to zero.
+    """
+    if lengths is None:
+        return x
+    mask = torch.arange(x.shape[time_dim], device=x.device)[None, :] < lengths[:, None]
+    shape = [1] * x.dim()
+    shape[0], shape[time_dim] = mask.shape
+    return x * mask.view(shape).to(x.dtype)
+
+
 class VocosBackbone(Backbone):
     """
     Vocos backbone module built with ConvNeXt blocks. Supports additional conditioning with Adaptive Layer Normalization
@@ -314,6 +449,7 @@ class VocosBackbone(Backbone):
             ]
         )
         self.final_layer_norm = nn.LayerNorm(dim, eps=1e-6)
+        self.time_major = False
         self.apply(self._init_weights)
 
     def _init_weights(self, m):
@@ -321,8 +457,22 @@ class VocosBackbone(Backbone):
             nn.init.trunc_normal_(m.weight, std=0.02)
             nn.init.constant_(m.bias, 0)
 
-    def forward(self, x: torch.Tensor, condition: torch.Tensor = None) -> torch.Tensor:
-        x = self.embed(x)
+    def forward(
+        self, x: torch.Tensor, condition: torch.Tensor = None, lengths: Optional[torch.Tensor] = None
+    ) -> torch.Tensor:
+        """
+        Args:
+            x (Tensor): Input of shape (B, C, L), or (B, L, C) in time-major mode.
+            condition (Tensor, optional): Condition of shape (B, condition_dim).
+            lengths (Tensor, optional): Valid frames of each padded sequence, shape (B,).
+
+        Returns:
+            Tensor: Output of shape (B, L, dim).
+        """
+        if self.time_major:
+            return self._forward_time_major(x, condition, lengths)
+
+        x = self.embed(mask_padding(x, lengths))
         if self.adanorm:
             assert condition is not None
             x = self.norm(x.transpose(1, 2), condition)
@@ -330,10 +480,23 @@ class VocosBackbone(Backbone):
             x = self.norm(x.transpose(1, 2))
         x = x.transpose(1, 2)
         for conv_block in self.convnext:
-            x = conv_block(x, condition)
+            x = conv_block(mask_padding(x, lengths), condition)
         x = self.final_layer_norm(x.transpose(1, 2))
         return x
 
+    def _forward_time_major(
+        self, x: torch.Tensor, condition: Optional[torch.Tensor], lengths: Optional[torch.Tensor]
+    ) -> torch.Tensor:
+        x = conv1d_time_major(mask_padding(x, lengths, time_dim=1), self.embed)
+        if self.adanorm:
+            assert condition is not None
+            x = self.norm(x, condition)
+        else:
+            x = self.norm(x)
+        for conv_block in self.convnext:
+            x = conv_block.forward_time_major(mask_padding(x, lengths, time_dim=1), condition)
+        return self.final_layer_norm(x)
+
 
 class VocosResNetBackbone(Backbone):
     """
@@ -371,3 +534,29 @@ class VocosResNetBackbone(Backbone):
         x = self.resnet(x)
         x = x.transpose(1, 2)
         return x
+
+
+# test
+if __name__ == "__main__":
+    torch.manual_seed(0)
+    x = torch.randn(3, 64, 120)
+    condition = torch.randn(3, 16)
+    lengths = torch.tensor([120, 97, 41])
+
+    same = True
+    for condition_dim in (None, 16):
+        backbone = VocosBackbone(
+            input_channels=64, dim=48, intermediate_dim=96, num_layers=4, condition_dim=condition_dim
+        ).eval()
+        cond = condition if condition_dim else None
+        with torch.no_grad():
+            expected = backbone(x, cond, lengths=lengths)
+            set_time_major(backbone)
+            output = backbone(x.transpose(1, 2).contiguous(), cond, lengths=lengths)
+            set_time_major(backbone, False)
+        same = same and output.is_contiguous() and torch.allclose(expected, output, atol=1e-5)
+
+    if same:
+        print("time-major parity test passed")
+    else:
+        print("time-major parity test failed")
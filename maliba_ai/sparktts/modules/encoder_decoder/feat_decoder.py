@@ -74,6 +74,7 @@ class Decoder(nn.Module):
         )
         self.linear = nn.Linear(vocos_dim, out_channels)
         self.use_tanh_at_final = use_tanh_at_final
+        self.time_major = False
 
     def forward(self, x: torch.Tensor, c: torch.Tensor = None):
         """encoder forward.
@@ -85,7 +86,11 @@ class Decoder(nn.Module):
             x (torch.Tensor): (batch_size, encode_channels, length)
         """
         x = self.linear_pre(x.transpose(1, 2))
-        x = self.downsample(x).transpose(1, 2)
+        if self.time_major:
+            for sampling_block, backbone in self.downsample:
+                x = backbone(sampling_block(x).transpose(1, 2))
+        else:
+            x = self.downsample(x).transpose(1, 2)
         x = self.vocos_backbone(x, condition=c)
         x = self.linear(x).transpose(1, 2)
         if self.use_tanh_at_final:
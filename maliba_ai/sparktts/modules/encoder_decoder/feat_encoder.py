@@ -17,9 +17,9 @@
 import torch
 import torch.nn as nn
 
-from typing import List
+from typing import List, Optional
 
-from maliba_ai.sparktts.modules.blocks.vocos import VocosBackbone
+from maliba_ai.sparktts.modules.blocks.vocos import VocosBackbone, mask_padding
 from maliba_ai.sparktts.modules.blocks.samper import SamplingBlock
 
 
@@ -43,6 +43,7 @@ class Encoder(nn.Module):
             sample_ratios (List[int]): sample ratios
                 example: [2, 2] means downsample by 2x and then upsample by 2x
         """
+        self.sample_ratios = list(sample_ratios)
         self.encoder = VocosBackbone(
             input_channels=input_channels,
             dim=vocos_dim,
@@ -72,17 +73,34 @@ class Encoder(nn.Module):
         self.downsample = nn.Sequential(*modules)
 
         self.project = nn.Linear(vocos_dim, out_channels)
+        self.time_major = False
 
-    def forward(self, x: torch.Tensor, *args):
+    def output_lengths(self, lengths: torch.Tensor) -> torch.Tensor:
+        """Number of output frames of inputs of the given lengths."""
+        for ratio in self.sample_ratios:
+            lengths = torch.div(lengths, ratio, rounding_mode="floor")
+        return lengths
+
+    def forward(self, x: torch.Tensor, *args, lengths: Optional[torch.Tensor] = None):
         """
         Args:
             x (torch.Tensor): (batch_size, input_channels, length)
+            lengths (torch.Tensor, optional): valid frames of each padded input, (batch_size,)
 
         Returns:
             x (torch.Tensor): (batch_size, encode_channels, length)
         """
-        x = self.encoder(x)
-        x = self.downsample(x)
+        if self.time_major:
+            x = x.transpose(1, 2)
+        x = self.encoder(x, lengths=lengths)
+        for (sampling_block, backbone), ratio in zip(self.downsample, self.sample_ratios):
+            x = sampling_block(mask_padding(x, lengths, time_dim=1))
+            if self.time_major:
+                # a view, the identity when the block does not resample
+                x = x.transpose(1, 2)
+            if lengths is not None:
+                lengths = torch.div(lengths, ratio, rounding_mode="floor")
+            x = backbone(x, lengths=lengths)
         x = self.project(x)
         return x.transpose(1, 2)
 
@@ -3,7 +3,7 @@ import torch
 import torch.nn.functional as F
 import torch.distributed as dist
 
-from typing import List
+from typing import List, Optional
 from torch import nn
 from torch.nn import Module
 from torch.amp import autocast
@@ -103,6 +103,9 @@ class ResidualFSQ(Module):
         self.quantize_dropout_cutoff_index = quantize_dropout_cutoff_index
         self.quantize_dropout_multiple_of = quantize_dropout_multiple_of  # encodec paper proposes structured dropout, believe this was set to 4
 
+        # output table of `get_output_from_table`, dropped by `invalidate_cache`
+        self._output_table: Optional[torch.Tensor] = None
+
     @property
     def codebooks(self):
         codebooks = [layer.implicit_codebook for layer in self.layers]
@@ -155,6 +158,56 @@ class ResidualFSQ(Module):
         codes_summed = reduce(codes, "q ... -> ...", "sum")
         return self.project_out(codes_summed)
 
+    def output_table(self) -> torch.Tensor:
+        """
+        Output of every code of every quantizer, scaled and projected out, without the
+        `project_out` bias. Shape (num_quantizers, codebook_size, dim).
+        Computed on first use and cached until `invalidate_cache`.
+        """
+        if self._output_table is None:
+            with torch.no_grad():
+                codes = self.codebooks.to(self.scales) * self.scales[:, None, :]
+                if self.has_projections:
+                    codes = codes @ self.project_out.weight.t()
+            self._output_table = codes
+        return self._output_table
+
+    def invalidate_cache(self) -> None:
+        """
+        Drop the cached output table. Moving the module, switching it between train and eval
+        mode or loading a state dict call it; call it after editing the weights in place.
+        """
+        self._output_table = None
+
+    def _apply(self, fn, *args, **kwargs):
+        self.invalidate_cache()
+        return super()._apply(fn, *args, **kwargs)
+
+    def train(self, mode: bool = True):
+        self.invalidate_cache()
+        return super().train(mode)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        self.invalidate_cache()
+        super()._load_from_state_dict(*args, **kwargs)
+
+    def get_output_from_table(self, indices):
+        """
+        Same as `get_output_from_indices` for indices of shape (b, n, q), as one gather
+        per quantizer from `output_table` and a sum.
+        """
+        if torch.is_grad_enabled() or indices.shape[-1] != self.num_quantizers or (indices < 0).any():
+            # the table is not differentiable, and quantize dropout indices need masking
+            return self.get_output_from_indices(indices)
+
+        table = self.output_table()
+        output = table[0][indices[..., 0]]
+        for q in range(1, self.num_quantizers):
+            output = output + table[q][indices[..., q]]
+        if self.has_projections and self.project_out.bias is not None:
+            output = output + self.project_out.bias
+        return output
+
     def forward(self, x, return_all_codes=False, rand_quantize_dropout_fixed_seed=None):
         num_quant, quant_dropout_multiple_of, device = (
             self.num_quantizers,
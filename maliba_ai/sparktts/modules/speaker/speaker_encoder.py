@@ -16,6 +16,7 @@
 import torch
 import torch.nn as nn
 
+from collections import OrderedDict
 from typing import List, Tuple
 from maliba_ai.sparktts.modules.fsq.residual_fsq import ResidualFSQ
 from maliba_ai.sparktts.modules.speaker.ecapa_tdnn import ECAPA_TDNN_GLOB_c512
@@ -36,6 +37,8 @@ class SpeakerEncoder(nn.Module):
         token_num (int): sequence length of speaker tokens
         fsq_levels (List[int]): number of levels for each quantizer
         fsq_num_quantizers (int): number of quantizers
+        detokenize_only (bool): skip the mel encoder layers, only `detokenize` can be used
+        d_vector_cache_size (int): d-vectors memoized by `detokenize`, per global token sequence
 
     Return:
         speaker_embs: (B, T2, out_dim)
@@ -49,15 +52,23 @@ class SpeakerEncoder(nn.Module):
         token_num: int = 32,
         fsq_levels: List[int] = [4, 4, 4, 4, 4, 4],
         fsq_num_quantizers: int = 1,
+        detokenize_only: bool = False,
+        d_vector_cache_size: int = 256,
     ):
         super(SpeakerEncoder, self).__init__()
 
-        self.speaker_encoder = ECAPA_TDNN_GLOB_c512(
-            feat_dim=input_dim, embed_dim=out_dim
-        )
-        self.perceiver_sampler = PerceiverResampler(
-            dim=latent_dim, dim_context=512 * 3, num_latents=token_num
-        )
+        self.token_num = token_num
+        self.detokenize_only = detokenize_only
+        if detokenize_only:
+            self.speaker_encoder = None
+            self.perceiver_sampler = None
+        else:
+            self.speaker_encoder = ECAPA_TDNN_GLOB_c512(
+                feat_dim=input_dim, embed_dim=out_dim
+            )
+            self.perceiver_sampler = PerceiverResampler(
+                dim=latent_dim, dim_context=512 * 3, num_latents=token_num
+            )
         self.quantizer = ResidualFSQ(
             levels=fsq_levels,
             num_quantizers=fsq_num_quantizers,
@@ -68,6 +79,10 @@ class SpeakerEncoder(nn.Module):
 
         self.project = nn.Linear(latent_dim * token_num, out_dim)
 
+        # least recently used d-vectors of `detokenize`, keyed by global tokens
+        self.d_vector_cache_size = d_vector_cache_size
+        self._d_vectors: "OrderedDict[Tuple[int, ...], torch.Tensor]" = OrderedDict()
+
     def get_codes_from_indices(self, indices: torch.Tensor) -> torch.Tensor:
         zq = self.quantizer.get_codes_from_indices(indices.transpose(1, 2))
         return zq.transpose(1, 2)
@@ -106,7 +121,45 @@ class SpeakerEncoder(nn.Module):
     
     def detokenize(self, indices: torch.Tensor) -> torch.Tensor:
         """detokenize the input indices to d-vector"""
-        zq = self.quantizer.get_output_from_indices(indices.transpose(1, 2)).transpose(1, 2)
+        if torch.is_grad_enabled() or self.d_vector_cache_size <= 0:
+            return self._detokenize(indices)
+
+        rows = [tuple(row) for row in indices.reshape(indices.shape[0], -1).tolist()]
+        missing = [i for i, row in enumerate(rows) if row not in self._d_vectors]
+        if missing:
+            d_vectors = self._detokenize(indices[missing])
+            for i, d_vector in zip(missing, d_vectors):
+                self._d_vectors[rows[i]] = d_vector
+        for row in rows:
+            self._d_vectors.move_to_end(row)
+        d_vector = torch.stack([self._d_vectors[row] for row in rows])
+        while len(self._d_vectors) > self.d_vector_cache_size:
+            self._d_vectors.popitem(last=False)
+        return d_vector
+
+    def invalidate_cache(self) -> None:
+        """
+        Drop the memoized d-vectors and the quantizer output table. Moving the module, switching
+        it between train and eval mode or loading a state dict call it; call it after editing
+        the quantizer or projection weights in place.
+        """
+        self._d_vectors.clear()
+        self.quantizer.invalidate_cache()
+
+    def _apply(self, fn, *args, **kwargs):
+        self.invalidate_cache()
+        return super()._apply(fn, *args, **kwargs)
+
+    def train(self, mode: bool = True):
+        self.invalidate_cache()
+        return super().train(mode)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        self.invalidate_cache()
+        super()._load_from_state_dict(*args, **kwargs)
+
+    def _detokenize(self, indices: torch.Tensor) -> torch.Tensor:
+        zq = self.quantizer.get_output_from_table(indices.transpose(1, 2)).transpose(1, 2)
         x = zq.reshape(zq.shape[0], -1)
         d_vector = self.project(x)
         return d_vector
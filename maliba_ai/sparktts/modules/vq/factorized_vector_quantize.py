@@ -16,7 +16,7 @@
 # Heavily based on https://github.com/lucidrains/vector-quantize-pytorch
 
 
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 import torch
 import torch.nn as nn
@@ -66,6 +66,8 @@ class FactorizedVectorQuantize(nn.Module):
 
         self.codebook = nn.Embedding(self.codebook_size, self.codebook_dim)
         self.register_buffer("cluster_size", torch.zeros(self.codebook_size))
+        # L2 normalized codebook used by `tokenize`, dropped by `invalidate_cache`
+        self._normalized_codebook: Optional[torch.Tensor] = None
 
     def forward(self, z: torch.Tensor) -> Dict[str, Any]:
         """Quantized the input tensor using a fixed codebook and returns
@@ -145,11 +147,64 @@ class FactorizedVectorQuantize(nn.Module):
             emb = self.out_project(emb)
         return emb
 
-    def tokenize(self, z: torch.Tensor) -> torch.Tensor:
+    def tokenize(self, z: torch.Tensor, chunk_size: int = 2048) -> torch.Tensor:
         """tokenize the input tensor"""
         z_e = self.in_project(z)
-        _, indices, _ = self.decode_latents(z_e)
-        return indices
+        return self.nearest_codes(z_e, chunk_size=chunk_size)
+
+    def normalized_codebook(self) -> torch.Tensor:
+        """L2 normalized codebook, computed on first use and cached until `invalidate_cache`."""
+        if self._normalized_codebook is None:
+            with torch.no_grad():
+                self._normalized_codebook = F.normalize(self.codebook.weight.detach())
+        return self._normalized_codebook
+
+    def invalidate_cache(self) -> None:
+        """
+        Drop the cached normalized codebook. Moving the module, switching it between train and
+        eval mode or loading a state dict call it; call it after editing the codebook in place.
+        """
+        self._normalized_codebook = None
+
+    def _apply(self, fn, *args, **kwargs):
+        self.invalidate_cache()
+        return super()._apply(fn, *args, **kwargs)
+
+    def train(self, mode: bool = True):
+        self.invalidate_cache()
+        return super().train(mode)
+
+    def _load_from_state_dict(self, *args, **kwargs):
+        self.invalidate_cache()
+        super()._load_from_state_dict(*args, **kwargs)
+
+    @torch.no_grad()
+    def nearest_codes(self, latents: torch.Tensor, chunk_size: int = 2048) -> torch.Tensor:
+        """
+        Indices of the nearest codes of projected latents, as in `decode_latents`.
+
+        With L2 normalized encodings and codes, the squared distance is 2 - 2 * e @ c.T, so the
+        nearest code is the one with the largest dot product. The search is one matmul and argmax
+        per chunk of `chunk_size` frames, which bounds the memory of the
+        (frames, codebook_size) score matrix.
+
+        Args:
+            latents (Tensor): Projected latents of shape (B, D, T).
+            chunk_size (int): Frames scored at once (default: 2048).
+
+        Returns:
+            Tensor: Code indices of shape (B, T).
+        """
+        if chunk_size <= 0:
+            raise ValueError("chunk_size should be positive")
+
+        codebook = self.normalized_codebook()
+        encodings = F.normalize(latents.transpose(1, 2).reshape(-1, latents.shape[1]))
+        indices = torch.empty(encodings.shape[0], dtype=torch.long, device=encodings.device)
+        for start in range(0, encodings.shape[0], chunk_size):
+            scores = encodings[start : start + chunk_size] @ codebook.t()
+            indices[start : start + chunk_size] = scores.argmax(1)
+        return indices.view(latents.shape[0], latents.shape[2])
 
     def detokenize(self, indices):
         """detokenize the input indices"""
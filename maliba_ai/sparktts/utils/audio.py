@@ -119,6 +119,22 @@ def load_audio(
     return audio
 
 
+def audio_length(adfile: Path, sampling_rate: int = None) -> int:
+    r"""Number of samples `load_audio` returns for a whole file, read from its header without decoding it
+
+    Args:
+        adfile (Path): path to audio file.
+        sampling_rate (int, optional): target sampling rate. Defaults to None.
+
+    Returns:
+        length (int): number of samples at the target sampling rate
+    """
+    info = soundfile.info(adfile)
+    if sampling_rate is None or info.samplerate == sampling_rate:
+        return info.frames
+    return int(round(info.frames * sampling_rate / info.samplerate))
+
+
 def random_select_audio_segment(audio: np.ndarray, length: int) -> np.ndarray:
     """get an audio segment given the length
 
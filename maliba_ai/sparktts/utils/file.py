@@ -22,11 +22,10 @@ Description:
 
 import os
 import json
-import json
 import csv
 
 from tqdm import tqdm
-from typing import List, Dict, Any, Set, Union
+from typing import List, Dict, Any, Callable, Iterable, Iterator, Set, Tuple, Union
 from pathlib import Path
 from omegaconf import OmegaConf, DictConfig
 
@@ -47,49 +46,141 @@ def resolve_symbolic_link(symbolic_link_path: Path) -> Path:
     return os.path.join(link_directory, target_path_relative)
 
 
-def write_jsonl(metadata: List[dict], file_path: Path) -> None:
-    """Writes a list of dictionaries to a JSONL file.
+def json_backend(name: str = "json") -> Tuple[Callable[[str], Any], Callable[[Any], str]]:
+    """
+    Returns the (loads, dumps) functions of a JSON library.
+
+    Args:
+    name : str
+        "json" (standard library), or "orjson" / "ujson" for faster parsing if installed.
+
+    Returns:
+    Tuple
+        loads parses one JSON document, dumps serializes one object to a single line string.
+    """
+    if name == "json":
+        return json.loads, lambda obj: json.dumps(obj, ensure_ascii=False)
+    if name == "orjson":
+        import orjson
+
+        return orjson.loads, lambda obj: orjson.dumps(obj).decode("utf-8")
+    if name == "ujson":
+        import ujson
+
+        return ujson.loads, lambda obj: ujson.dumps(obj, ensure_ascii=False)
+    raise ValueError(f"unknown JSON backend '{name}', use json, orjson or ujson")
+
+
+class JsonlWriter:
+    """
+    Incremental JSONL writer, appending one dictionary per line.
+
+    Lines are written as they come, and the file is flushed every `flush_every` lines, so
+    manifests of any size can be produced with constant memory and survive interruptions.
+
+    Example:
+        with JsonlWriter("manifest.jsonl") as writer:
+            for meta in metas:
+                writer.write(meta)
+    """
+
+    def __init__(self, file_path: Path, append: bool = True, flush_every: int = 1000, backend: str = "json"):
+        """
+        Args:
+        file_path : Path
+            The JSONL file to write to.
+        append : bool
+            Append to an existing file instead of overwriting it.
+        flush_every : int
+            Number of lines written between two flushes.
+        backend : str
+            JSON library used to serialize the lines, see `json_backend`.
+        """
+        _, self._dumps = json_backend(backend)
+        self.file_path = file_path
+        self.flush_every = flush_every
+        self.num_lines = 0
+        self._file = open(file_path, "a" if append else "w", encoding="utf-8")
+
+    def __enter__(self) -> "JsonlWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(self, meta: dict) -> None:
+        self._file.write(self._dumps(meta) + "\n")
+        self.num_lines += 1
+        if self.flush_every and self.num_lines % self.flush_every == 0:
+            self._file.flush()
+
+    def write_many(self, metadata: Iterable[dict]) -> None:
+        for meta in metadata:
+            self.write(meta)
+
+    def flush(self) -> None:
+        self._file.flush()
+
+    def close(self) -> None:
+        if not self._file.closed:
+            self._file.close()
+
+
+def write_jsonl(metadata: Iterable[dict], file_path: Path, backend: str = "json") -> None:
+    """Writes dictionaries to a JSONL file.
 
     Args:
-    metadata : List[dict]
-        A list of dictionaries, each representing a piece of meta.
+    metadata : Iterable[dict]
+        Dictionaries, each representing a piece of meta. A generator is written as it is consumed.
     file_path : Path
         The file path to save the JSONL file
+    backend : str
+        JSON library used to serialize the lines, see `json_backend`.
 
-    This function writes each dictionary in the list to a new line in the specified file.
+    This function writes each dictionary to a new line in the specified file.
     """
-    with open(file_path, "w", encoding="utf-8") as f:
-        for meta in tqdm(metadata, desc="writing jsonl"):
-            # Convert dictionary to JSON string and write it to the file with a newline
-            json_str = json.dumps(meta, ensure_ascii=False) + "\n"
-            f.write(json_str)
+    with JsonlWriter(file_path, append=False, backend=backend) as writer:
+        writer.write_many(tqdm(metadata, desc="writing jsonl"))
     print(f"jsonl saved to {file_path}")
 
 
-def read_jsonl(file_path: Path) -> List[dict]:
+def iter_jsonl(file_path: Path, backend: str = "json") -> Iterator[dict]:
+    """
+    Iterates over the dictionaries of a JSONL file, reading one line at a time.
+
+    Args:
+    file_path : Path
+        The path to the JSONL file to be read.
+    backend : str
+        JSON library used to parse the lines, see `json_backend`.
+
+    Yields:
+    dict
+        The dictionary parsed from each non empty line of the JSONL file.
+    """
+    loads, _ = json_backend(backend)
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield loads(line)
+
+
+def read_jsonl(file_path: Path, backend: str = "json") -> List[dict]:
     """
     Reads a JSONL file and returns a list of dictionaries.
 
     Args:
     file_path : Path
         The path to the JSONL file to be read.
+    backend : str
+        JSON library used to parse the lines, see `json_backend`.
 
     Returns:
     List[dict]
         A list of dictionaries parsed from each line of the JSONL file.
     """
-    metadata = []
-    # Open the file for reading
-    with open(file_path, "r", encoding="utf-8") as f:
-        # Split the file into lines
-        lines = f.read().splitlines()
-    # Process each line
-    for line in lines:
-        # Convert JSON string back to dictionary and append to list
-        meta = json.loads(line)
-        metadata.append(meta)
-    # Return the list of metadata
-    return metadata
+    return list(iter_jsonl(file_path, backend=backend))
 
 def read_json_as_jsonl(file_path: Path) -> List[dict]:
     metadata = []
@@ -131,28 +222,25 @@ def load_config(config_path: Path) -> DictConfig:
 
 
 
-def jsonl_to_csv(jsonl_file_path: str, csv_file_path: str) -> None:
+def jsonl_to_csv(jsonl_file_path: str, csv_file_path: str, backend: str = "json") -> None:
     """
     Converts a JSONL file to a CSV file.
     
     This function reads a JSONL file, determines all unique keys present in the file,
-    and writes the data to a CSV file with columns for all these keys.
+    and writes the data to a CSV file with columns for all these keys. The file is read
+    twice, once for the keys and once for the rows, so memory use does not depend on its size.
     """
     
     all_keys = set()
-    data_rows = []
     
-    # Read the JSONL file once to extract keys and collect data
-    with open(jsonl_file_path, 'r') as file:
-        for line in file:
-            data = json.loads(line.strip())
-            data_rows.append(data)
-            all_keys.update(data.keys())
+    # First pass: collect the keys
+    for data in iter_jsonl(jsonl_file_path, backend=backend):
+        all_keys.update(data.keys())
     
     # Convert the set of keys to a sorted list for consistent column order
     sorted_keys = sorted(all_keys)
     
-    # Write the data to a CSV file
+    # Second pass: write the data to a CSV file
     with open(csv_file_path, 'w', newline='') as csvfile:
         writer = csv.DictWriter(csvfile, fieldnames=sorted_keys)
         
@@ -160,7 +248,7 @@ def jsonl_to_csv(jsonl_file_path: str, csv_file_path: str) -> None:
         writer.writeheader()
         
         # Write each row of data
-        for data in data_rows:
+        for data in iter_jsonl(jsonl_file_path, backend=backend):
             writer.writerow(data)
     
     print(f"CSV file has been created at {csv_file_path}")
@@ -0,0 +1,345 @@
+"""
+Description:
+    Opt-in instrumentation of the synthesis stages.
+
+    Code to instrument wraps each stage in `metrics.stage(name)`. With a `Metrics` object the wall
+    time, token count and peak CUDA memory of the stage are recorded in Prometheus-style counters
+    and histograms and handed to an optional callback. The default `NULL_METRICS` records nothing
+    and costs one method call per stage.
+"""
+
+import math
+import time
+import torch
+import threading
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# seconds, from a single decode step to a long utterance on CPU
+DEFAULT_TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# bytes, 16 MB to 64 GB
+DEFAULT_MEMORY_BUCKETS = tuple(float(2 ** exponent) for exponent in range(24, 37))
+
+
+@dataclass
+class StageRecord:
+    """
+    Measurements of one run of a stage.
+
+    Args:
+        name (str): Stage name, e.g. "prefill".
+        tokens (int): Tokens processed by the stage, set by the instrumented code.
+        seconds (float): Wall time of the stage.
+        peak_memory_bytes (int, optional): Peak CUDA memory allocated during the stage,
+            None when memory is not tracked.
+    """
+
+    name: str
+    tokens: int = 0
+    seconds: float = 0.0
+    peak_memory_bytes: Optional[int] = None
+
+
+def _label_text(labels: Tuple[Tuple[str, str], ...]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Monotonic counter with one value per label set."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self._values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        if amount < 0:
+            raise ValueError("counters can only be increased")
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0.0)
+
+    def expose(self) -> List[str]:
+        """Lines of the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """Cumulative histogram with a count and a sum, with one series per label set."""
+
+    def __init__(self, name: str, documentation: str, buckets: Sequence[float] = DEFAULT_TIME_BUCKETS):
+        if list(buckets) != sorted(buckets) or not buckets:
+            raise ValueError("buckets should be a non-empty increasing sequence")
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(float(bound) for bound in buckets) + (math.inf,)
+        # label set -> (per bucket counts, sum)
+        self._series: Dict[Tuple[Tuple[str, str], ...], Tuple[List[int], float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total = self._series.get(key) or ([0] * len(self.buckets), 0.0)
+            counts[bisect_left(self.buckets, value)] += 1
+            self._series[key] = (counts, total + value)
+
+    def count(self, **labels: str) -> int:
+        counts, _ = self._series.get(tuple(sorted(labels.items())), ([0], 0.0))
+        return sum(counts)
+
+    def sum(self, **labels: str) -> float:
+        return self._series.get(tuple(sorted(labels.items())), ([0], 0.0))[1]
+
+    def expose(self) -> List[str]:
+        """Lines of the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    labels = _label_text(key + (("le", _format_value(bound)),))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                lines.append(f"{self.name}_sum{_label_text(key)} {_format_value(total)}")
+                lines.append(f"{self.name}_count{_label_text(key)} {cumulative}")
+        return lines
+
+
+class _NullStage:
+    """Reusable context manager of `NullMetrics.stage`, cheaper than a generator based one."""
+
+    _record = StageRecord("")
+
+    def __enter__(self) -> StageRecord:
+        return self._record
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+class NullMetrics:
+    """Metrics that record nothing, the default of every instrumented object."""
+
+    enabled = False
+
+    def stage(self, name: str, tokens: int = 0) -> _NullStage:
+        return _NULL_STAGE
+
+    def start_stage(self, name: str, tokens: int = 0) -> StageRecord:
+        return _NullStage._record
+
+    def end_stage(self, record: StageRecord) -> StageRecord:
+        return record
+
+    def record(self, record: StageRecord) -> None:
+        return None
+
+
+NULL_METRICS = NullMetrics()
+
+
+class _OpenStage:
+    __slots__ = ("record", "start", "peak_memory")
+
+    def __init__(self, record: StageRecord, start: float, peak_memory: int):
+        self.record = record
+        self.start = start
+        self.peak_memory = peak_memory
+
+
+class Metrics:
+    """
+    Per-stage wall time, token and peak memory metrics.
+
+    Each stage updates:
+        <prefix>_stage_calls_total{stage}           counter
+        <prefix>_stage_tokens_total{stage}          counter
+        <prefix>_stage_seconds{stage}               histogram
+        <prefix>_stage_peak_memory_bytes{stage}     histogram, when CUDA memory is tracked
+
+    Stages may be nested and may run in several threads. Peak memory is read from the CUDA
+    allocator statistics of the device, which are shared by every thread, so the peaks of
+    concurrent stages include each other's allocations.
+
+    Example:
+        metrics = Metrics()
+        tts = BambaraTTSInference(metrics=metrics)
+        tts.generate_speech("I ni ce")
+        print(metrics.expose())
+    """
+
+    enabled = True
+
+    def __init__(
+        self,
+        prefix: str = "maliba_tts",
+        callback: Optional[Callable[[StageRecord], None]] = None,
+        device: Optional[torch.device] = None,
+        track_memory: bool = True,
+        synchronize: bool = True,
+        time_buckets: Sequence[float] = DEFAULT_TIME_BUCKETS,
+        memory_buckets: Sequence[float] = DEFAULT_MEMORY_BUCKETS,
+    ):
+        """
+        Args:
+            prefix (str): Prefix of the metric names (default: "maliba_tts").
+            callback (Callable, optional): Called with the `StageRecord` of every finished stage.
+            device (torch.device, optional): CUDA device whose memory is tracked, the current one by default.
+            track_memory (bool): Record peak CUDA memory per stage, ignored without CUDA (default: True).
+            synchronize (bool): Wait for queued CUDA kernels at stage boundaries, so that kernels are
+                timed in the stage that launched them (default: True).
+            time_buckets (Sequence[float]): Upper bounds of the duration histogram buckets, in seconds.
+            memory_buckets (Sequence[float]): Upper bounds of the memory histogram buckets, in bytes.
+        """
+        self.callback = callback
+        cuda = torch.cuda.is_available()
+        self.device = torch.device(device) if device is not None else (torch.device("cuda") if cuda else None)
+        if self.device is not None and self.device.type != "cuda":
+            self.device = None
+        self.track_memory = track_memory and self.device is not None
+        self.synchronize = synchronize and self.device is not None
+
+        self.calls = Counter(f"{prefix}_stage_calls_total", "Runs of each synthesis stage.")
+        self.tokens = Counter(f"{prefix}_stage_tokens_total", "Tokens processed by each synthesis stage.")
+        self.seconds = Histogram(f"{prefix}_stage_seconds", "Wall time of each synthesis stage.", time_buckets)
+        self.peak_memory = Histogram(
+            f"{prefix}_stage_peak_memory_bytes", "Peak CUDA memory allocated during each synthesis stage.", memory_buckets
+        )
+        self._local = threading.local()
+
+    def _stack(self) -> List[_OpenStage]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start_stage(self, name: str, tokens: int = 0) -> StageRecord:
+        """
+        Start timing a stage, for stages that can not be wrapped in `stage()`.
+        Every call must be matched by an `end_stage` of the returned record, in reverse order.
+        """
+        if self.synchronize:
+            torch.cuda.synchronize(self.device)
+        if self.track_memory:
+            stack = self._stack()
+            # the allocator keeps a single peak, so the enclosing stage saves its own before it is reset
+            if stack:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, torch.cuda.max_memory_allocated(self.device))
+            torch.cuda.reset_peak_memory_stats(self.device)
+        record = StageRecord(name, tokens=tokens)
+        self._stack().append(_OpenStage(record, time.perf_counter(), 0))
+        return record
+
+    def end_stage(self, record: StageRecord) -> StageRecord:
+        """Finish a stage started with `start_stage` and record its measurements."""
+        if self.synchronize:
+            torch.cuda.synchronize(self.device)
+        stack = self._stack()
+        if not stack or stack[-1].record is not record:
+            raise RuntimeError(f"stage '{record.name}' is not the innermost running stage")
+        open_stage = stack.pop()
+        record.seconds = time.perf_counter() - open_stage.start
+        if self.track_memory:
+            record.peak_memory_bytes = max(open_stage.peak_memory, torch.cuda.max_memory_allocated(self.device))
+            if stack:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, record.peak_memory_bytes)
+        self.record(record)
+        return record
+
+    @contextmanager
+    def stage(self, name: str, tokens: int = 0) -> Iterator[StageRecord]:
+        """
+        Time the enclosed code as stage `name`. The yielded record's `tokens` may be set inside
+        the block, once the number of processed tokens is known.
+        """
+        record = self.start_stage(name, tokens)
+        try:
+            yield record
+        finally:
+            self.end_stage(record)
+
+    def record(self, record: StageRecord) -> None:
+        """Add the measurements of a finished stage, e.g. one timed by other means."""
+        self.calls.inc(stage=record.name)
+        self.tokens.inc(record.tokens, stage=record.name)
+        self.seconds.observe(record.seconds, stage=record.name)
+        if record.peak_memory_bytes is not None:
+            self.peak_memory.observe(record.peak_memory_bytes, stage=record.name)
+        if self.callback is not None:
+            self.callback(record)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Calls, tokens, total and mean seconds of every stage recorded so far."""
+        summary = {}
+        for key, calls in sorted(self.calls._values.items()):
+            labels = dict(key)
+            seconds = self.seconds.sum(**labels)
+            summary[labels["stage"]] = {
+                "calls": int(calls),
+                "tokens": int(self.tokens.value(**labels)),
+                "seconds": seconds,
+                "mean_seconds": seconds / calls,
+            }
+        return summary
+
+    def expose(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = self.calls.expose() + self.tokens.expose() + self.seconds.expose()
+        if self.track_memory:
+            lines += self.peak_memory.expose()
+        return "\n".join(lines) + "\n"
+
+
+# test
+if __name__ == "__main__":
+    records = []
+    metrics = Metrics(callback=records.append)
+    for _ in range(3):
+        with metrics.stage("decode") as stage:
+            with metrics.stage("prefill", tokens=10):
+                time.sleep(0.002)
+            stage.tokens = 5
+
+    # the disabled path should cost about as much as an empty `with` block
+    iterations = 100_000
+    start = time.perf_counter()
+    for _ in range(iterations):
+        with NULL_METRICS.stage("decode"):
+            pass
+    null_ns = (time.perf_counter() - start) / iterations * 1e9
+
+    summary = metrics.summary()
+    if (
+        len(records) == 6
+        and summary["decode"] == {**summary["decode"], "calls": 3, "tokens": 15}
+        and summary["prefill"]["seconds"] >= summary["prefill"]["calls"] * 0.002
+        and summary["decode"]["seconds"] >= summary["prefill"]["seconds"]
+        and 'maliba_tts_stage_seconds_bucket{stage="prefill",le="+Inf"} 3' in metrics.expose()
+    ):
+        print(f"test successful (disabled stage: {null_ns:.0f} ns)")
+    else:
+        print("test failed")
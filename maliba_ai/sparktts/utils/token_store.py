@@ -0,0 +1,239 @@
+"""
+Description:
+    Compact on-disk store of BiCodec tokens.
+
+    A store is a directory holding:
+        shard-XXXXX.semantic.npy   uint16, semantic tokens of the shard utterances, concatenated
+        shard-XXXXX.global.npy     uint16, (num_utterances, global_dim) global tokens of the shard
+        index.npy                  int64, (num_utterances, 4): shard, row in the shard,
+                                   semantic offset and semantic length
+        metadata.jsonl             one JSON object per utterance, in index order
+
+    Shards are memory-mapped when read, so an utterance is a zero-copy view into them.
+"""
+
+import os
+import numpy as np
+
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from maliba_ai.sparktts.utils.file import JsonlWriter, iter_jsonl, read_jsonl
+
+
+INDEX_FILE = "index.npy"
+METADATA_FILE = "metadata.jsonl"
+TOKEN_DTYPE = np.uint16
+
+
+def _shard_paths(root: Path, shard: int) -> Tuple[Path, Path]:
+    return (
+        Path(root) / f"shard-{shard:05d}.semantic.npy",
+        Path(root) / f"shard-{shard:05d}.global.npy",
+    )
+
+
+def _clear_store(root: Path) -> None:
+    """Delete the files of a token store in `root`, leaving any other file alone."""
+    for path in Path(root).glob("shard-*.npy"):
+        path.unlink()
+    for name in (INDEX_FILE, METADATA_FILE):
+        if (Path(root) / name).exists():
+            (Path(root) / name).unlink()
+
+
+def _as_tokens(tokens: Any, name: str) -> np.ndarray:
+    """Convert CPU token indices (numpy array, torch tensor, list) to a flat uint16 array."""
+    tokens = np.asarray(tokens).reshape(-1)
+    if tokens.size and (tokens.min() < 0 or tokens.max() > np.iinfo(TOKEN_DTYPE).max):
+        raise ValueError(f"{name} should be in [0, {np.iinfo(TOKEN_DTYPE).max}]")
+    return tokens.astype(TOKEN_DTYPE)
+
+
+class TokenStoreWriter:
+    """
+    Writes utterance tokens to a token store, one shard every `shard_tokens` semantic tokens.
+
+    Example:
+        with TokenStoreWriter("tokens/train") as writer:
+            for path in paths:
+                global_tokens, semantic_tokens = tokenizer.tokenize(path)
+                writer.add(global_tokens.cpu(), semantic_tokens.cpu(), audio=path)
+    """
+
+    def __init__(self, root: Path, shard_tokens: int = 50_000_000):
+        """
+        Args:
+            root (Path): Directory of the store, created if needed. An existing store is overwritten.
+            shard_tokens (int): Semantic tokens per shard (default: 50M, i.e. 100 MB shards).
+        """
+        if shard_tokens <= 0:
+            raise ValueError("shard_tokens should be positive")
+
+        self.root = Path(root)
+        self.shard_tokens = shard_tokens
+        os.makedirs(self.root, exist_ok=True)
+        # shards of an earlier, larger store would otherwise outlive the new index
+        _clear_store(self.root)
+
+        self._index: List[Tuple[int, int, int, int]] = []
+        self._metadata_writer = JsonlWriter(self.root / METADATA_FILE, append=False)
+        self._shard = 0
+        self._semantic: List[np.ndarray] = []
+        self._global: List[np.ndarray] = []
+        self._offset = 0
+        self._global_shape: Optional[Tuple[int, ...]] = None
+        self._closed = False
+
+    def __enter__(self) -> "TokenStoreWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def add(self, global_tokens: Any, semantic_tokens: Any, **metadata) -> int:
+        """
+        Append one utterance.
+
+        Args:
+            global_tokens: Global token indices, flattened. Every utterance must have as many.
+            semantic_tokens: Semantic token indices, flattened.
+            **metadata: JSON serializable fields stored in the metadata table.
+
+        Returns:
+            int: Index of the utterance in the store.
+        """
+        if self._closed:
+            raise ValueError("the token store writer is closed")
+
+        global_tokens = _as_tokens(global_tokens, "global_tokens")
+        semantic_tokens = _as_tokens(semantic_tokens, "semantic_tokens")
+        if self._global_shape is None:
+            self._global_shape = global_tokens.shape
+        elif global_tokens.shape != self._global_shape:
+            raise ValueError("all utterances should have the same number of global tokens")
+
+        if self._semantic and self._offset + len(semantic_tokens) > self.shard_tokens:
+            self._flush_shard()
+
+        self._index.append((self._shard, len(self._global), self._offset, len(semantic_tokens)))
+        self._semantic.append(semantic_tokens)
+        self._global.append(global_tokens)
+        self._offset += len(semantic_tokens)
+        self._metadata_writer.write(metadata)
+        return len(self._index) - 1
+
+    def _flush_shard(self) -> None:
+        semantic_path, global_path = _shard_paths(self.root, self._shard)
+        np.save(semantic_path, np.concatenate(self._semantic) if self._semantic else np.zeros(0, TOKEN_DTYPE))
+        np.save(global_path, np.stack(self._global) if self._global else np.zeros((0, 0), TOKEN_DTYPE))
+        self._shard += 1
+        self._semantic, self._global = [], []
+        self._offset = 0
+
+    def close(self) -> None:
+        """Write the last shard and the index."""
+        if self._closed:
+            return
+        if self._semantic or not self._index:
+            self._flush_shard()
+        np.save(self.root / INDEX_FILE, np.asarray(self._index, dtype=np.int64).reshape(-1, 4))
+        self._metadata_writer.close()
+        self._closed = True
+
+
+class TokenStore:
+    """
+    Memory-mapped reader of a token store.
+
+    Indexing returns (global_tokens, semantic_tokens) numpy views into the shards; nothing is
+    copied or loaded until the values are accessed.
+    """
+
+    def __init__(self, root: Path):
+        """
+        Args:
+            root (Path): Directory of the store.
+        """
+        self.root = Path(root)
+        self.index = np.load(self.root / INDEX_FILE)
+        self._shards: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._metadata: Optional[List[dict]] = None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _get_shard(self, shard: int) -> Tuple[np.ndarray, np.ndarray]:
+        if shard not in self._shards:
+            semantic_path, global_path = _shard_paths(self.root, shard)
+            self._shards[shard] = (
+                np.load(semantic_path, mmap_mode="r"),
+                np.load(global_path, mmap_mode="r"),
+            )
+        return self._shards[shard]
+
+    def __getitem__(self, i: int) -> Tuple[np.ndarray, np.ndarray]:
+        shard, row, offset, length = self.index[i]
+        semantic_tokens, global_tokens = self._get_shard(int(shard))
+        return global_tokens[row], semantic_tokens[offset : offset + length]
+
+    def __iter__(self) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def semantic_lengths(self) -> np.ndarray:
+        """Number of semantic tokens of every utterance, e.g. to bucket them by length."""
+        return self.index[:, 3]
+
+    def iter_metadata(self) -> Iterator[dict]:
+        """Metadata of every utterance in index order, streamed from the metadata table."""
+        return iter_jsonl(self.root / METADATA_FILE)
+
+    def metadata(self, i: int) -> dict:
+        """Metadata of the i-th utterance, the whole table is loaded on first call."""
+        if self._metadata is None:
+            self._metadata = read_jsonl(self.root / METADATA_FILE)
+        return self._metadata[i]
+
+
+# test
+if __name__ == "__main__":
+    import tempfile
+
+    rng = np.random.default_rng(0)
+    utterances = [
+        (rng.integers(0, 4096, 32), rng.integers(0, 8192, rng.integers(1, 200)))
+        for _ in range(50)
+    ]
+
+    with tempfile.TemporaryDirectory() as root:
+        with TokenStoreWriter(root, shard_tokens=1000) as writer:
+            for i, (global_tokens, semantic_tokens) in enumerate(utterances):
+                writer.add(global_tokens, semantic_tokens, index=i)
+
+        store = TokenStore(root)
+        same = all(
+            np.array_equal(store[i][0], global_tokens) and np.array_equal(store[i][1], semantic_tokens)
+            for i, (global_tokens, semantic_tokens) in enumerate(utterances)
+        )
+        shards = len([name for name in os.listdir(root) if name.endswith(".semantic.npy")])
+        read_back = same and len(store) == len(utterances) and store.metadata(7) == {"index": 7}
+
+        # a width change in a later shard is refused, a rewrite leaves no stale shard behind
+        with TokenStoreWriter(root, shard_tokens=30) as writer:
+            writer.add(np.zeros(32), np.zeros(20))
+            writer.add(np.zeros(32), np.zeros(20))
+            try:
+                writer.add(np.zeros(16), np.zeros(20))
+                refused = False
+            except ValueError:
+                refused = True
+        rewritten = len([name for name in os.listdir(root) if name.endswith(".semantic.npy")]) == 2
+
+        if read_back and refused and rewritten:
+            print(f"test successful ({shards} shards)")
+        else:
+            print("test failed")
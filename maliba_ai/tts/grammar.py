@@ -0,0 +1,102 @@
+import torch
+
+from typing import Dict, Optional, Sequence, Tuple
+from transformers import LogitsProcessor, PreTrainedTokenizerBase
+
+from maliba_ai.tts.tokens import BiCodecTokenMap
+
+
+class BiCodecGrammarLogitsProcessor(LogitsProcessor):
+    """
+    Logits processor constraining generation to the BiCodec output grammar:
+
+        global_token * num_global_tokens, separator tokens, semantic_token *, end_semantic, eos
+
+    At every step the scores are masked down to the ids allowed by the current phase, so the
+    sampling warpers only ever see valid candidates, and the end of the grammar is forced
+    deterministically.
+    """
+
+    def __init__(
+        self,
+        token_map: BiCodecTokenMap,
+        prompt_length: int,
+        num_global_tokens: int,
+        separator_ids: Sequence[int],
+        end_semantic_id: Optional[int],
+        eos_token_id: int,
+    ):
+        """
+        Args:
+            token_map (BiCodecTokenMap): Lookup tables of the model vocabulary.
+            prompt_length (int): Length of the (padded) prompt, generation starts right after it.
+            num_global_tokens (int): Global tokens to generate, 0 when they are part of the prompt.
+            separator_ids (Sequence[int]): Ids forced between the global and the semantic block.
+            end_semantic_id (int, optional): Id closing the semantic block, if the vocabulary has one.
+            eos_token_id (int): Id ending generation.
+        """
+        self.token_map = token_map
+        self.prompt_length = prompt_length
+        self.num_global_tokens = num_global_tokens
+        self.separator_ids = list(separator_ids)
+        self.end_semantic_id = end_semantic_id
+        self.eos_token_id = eos_token_id
+        self._masks: Dict[Tuple[torch.device, int], Tuple[torch.Tensor, torch.Tensor]] = {}
+
+    @classmethod
+    def from_tokenizer(
+        cls,
+        tokenizer: PreTrainedTokenizerBase,
+        token_map: BiCodecTokenMap,
+        prompt_length: int,
+        num_global_tokens: int,
+    ) -> "BiCodecGrammarLogitsProcessor":
+        """Build the processor, looking the structural token ids up in the tokenizer vocabulary."""
+        vocab = tokenizer.get_vocab()
+        separator_ids = [
+            vocab[token] for token in ("<|end_global_token|>", "<|start_semantic_token|>") if token in vocab
+        ]
+        return cls(
+            token_map=token_map,
+            prompt_length=prompt_length,
+            num_global_tokens=num_global_tokens,
+            separator_ids=separator_ids if num_global_tokens > 0 else [],
+            end_semantic_id=vocab.get("<|end_semantic_token|>"),
+            eos_token_id=tokenizer.eos_token_id,
+        )
+
+    def _get_masks(self, device: torch.device, vocab_size: int) -> Tuple[torch.Tensor, torch.Tensor]:
+        """Boolean masks of the ids allowed in the global and in the semantic phase."""
+        key = (device, vocab_size)
+        if key not in self._masks:
+            global_indices, semantic_indices = self.token_map.lookup(torch.arange(vocab_size, device=device))
+            semantic_mask = semantic_indices >= 0
+            semantic_mask[self.eos_token_id] = True
+            if self.end_semantic_id is not None:
+                semantic_mask[self.end_semantic_id] = True
+            self._masks[key] = (global_indices >= 0, semantic_mask)
+        return self._masks[key]
+
+    @staticmethod
+    def _force(scores: torch.FloatTensor, token_id: int) -> torch.FloatTensor:
+        forced = torch.full_like(scores, -float("inf"))
+        forced[:, token_id] = 0.0
+        return forced
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        step = input_ids.shape[1] - self.prompt_length
+        global_mask, semantic_mask = self._get_masks(scores.device, scores.shape[-1])
+
+        if step < self.num_global_tokens:
+            return scores.masked_fill(~global_mask, -float("inf"))
+
+        step -= self.num_global_tokens
+        if step < len(self.separator_ids):
+            return self._force(scores, self.separator_ids[step])
+
+        scores = scores.masked_fill(~semantic_mask, -float("inf"))
+        if self.end_semantic_id is not None:
+            # rows that closed the semantic block can only end the sequence
+            closed = input_ids[:, -1] == self.end_semantic_id
+            scores = torch.where(closed.unsqueeze(1), self._force(scores, self.eos_token_id), scores)
+        return scores
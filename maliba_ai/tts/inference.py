@@ -1,24 +1,371 @@
+import copy
 import torch
+import inspect
 import numpy as np
-import re
+import threading
+import transformers
 import soundfile as sf
 
+from contextlib import contextmanager
+from transformers import DynamicCache, LogitsProcessorList, StaticCache, StoppingCriteriaList
+from transformers.generation.streamers import BaseStreamer
 from maliba_ai.models.models import load_tts_model, load_audio_tokenizer
 from maliba_ai.config.speakers import Adama, SingleSpeaker, Settings
-from typing import  Optional
+from maliba_ai.config.settings import ClonedVoice, Voice
+from maliba_ai.tts.streaming import TokenIdStreamer, StreamerCancelCriteria, crossfade
+from maliba_ai.tts.tokens import BiCodecTokenMap
+from maliba_ai.tts.grammar import BiCodecGrammarLogitsProcessor
+from maliba_ai.tts.speaker_cache import SpeakerCache, SpeakerEntry
+from maliba_ai.tts.pipeline import VocoderWorker
+from maliba_ai.tts.text import DEFAULT_PAUSES, split_text
+from maliba_ai.tts.metrics import NULL_METRICS, GenerationStageProcessor, Metrics
+from maliba_ai.sparktts.models.bicodec import PreparedSpeaker
+from maliba_ai.sparktts.models.audio_tokenizer import BiCodecTokenizer
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+try:
+    from transformers import CompileConfig
+except ImportError:  # older transformers releases can not compile the decode step of generate
+    CompileConfig = None
+
 
 class BambaraTTSInference:
-    def __init__(self, model_path:Optional[str] = Settings.model_repo, max_seq_length:Optional[int] = 2048):
+    def __init__(
+        self,
+        model_path:Optional[str] = Settings.model_repo,
+        max_seq_length:Optional[int] = 2048,
+        use_speaker_cache: bool = False,
+        speaker_cache_path: Optional[str] = None,
+        static_cache: bool = False,
+        compile_decode: bool = False,
+        prefix_cache: bool = False,
+        detokenize_only: bool = False,
+        vocoder_chunk_tokens: Optional[int] = None,
+        optimize_vocoder: bool = False,
+        voice_registry_path: Optional[str] = None,
+        metrics: Optional[Metrics] = None,
+    ):
         """
         Initialize the Bambara TTS inference class.
-        
+
         Args:
             model_path (str, optional): Path to the model (local or huggingface repo id).
+            max_seq_length (int, optional): Maximum prompt plus generated tokens (default: 2048).
+            use_speaker_cache (bool): Reuse the global tokens of each speaker after its first request,
+                so following requests skip their generation and keep a consistent voice (default: False).
+            speaker_cache_path (str, optional): File the speaker cache is loaded from and saved to.
+            static_cache (bool): Decode with a KV cache preallocated to `max_seq_length` and reused
+                across requests, instead of growing a new cache every call (default: False).
+            compile_decode (bool): Compile the single-token decode step with `torch.compile`,
+                on CPU as well as on GPU. Implies `static_cache` (default: False). Raises a RuntimeError
+                when the installed transformers can not compile `generate` on the device.
+            prefix_cache (bool): Keep the KV state of the task and speaker prompt prefix of each speaker,
+                so single-text requests only prefill their own text. Not used with the static cache
+                (default: False).
+            detokenize_only (bool): Load only the parts of the audio tokenizer that turn tokens into
+                audio, which is all speech generation needs (default: False).
+            vocoder_chunk_tokens (int, optional): Vocode long utterances in overlapping windows of this
+                many semantic tokens, so vocoder memory stays flat whatever their length (default: None).
+            optimize_vocoder (bool): Rewrite the audio tokenizer with `BiCodec.optimize_for_inference`,
+                folding and fusing its layers for faster vocoding. Time-major execution is left off,
+                it was measured slower end to end (default: False).
+            voice_registry_path (str, optional): File the voices of `register_voice` are loaded from
+                and saved to. Registered voices only live in memory when None.
+            metrics (Metrics, optional): Record the wall time, token count and peak CUDA memory of
+                every synthesis stage, from prompt tokenization to file writing. Nothing is recorded
+                when None.
+        """
+        device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        model, tokenizer = load_tts_model(model_path=model_path, max_seq_length=max_seq_length)
+        audio_tokenizer = load_audio_tokenizer(device, detokenize_only=detokenize_only)
+        self._setup(
+            model,
+            tokenizer,
+            audio_tokenizer,
+            device,
+            max_seq_length=max_seq_length,
+            use_speaker_cache=use_speaker_cache,
+            speaker_cache_path=speaker_cache_path,
+            static_cache=static_cache,
+            compile_decode=compile_decode,
+            prefix_cache=prefix_cache,
+            vocoder_chunk_tokens=vocoder_chunk_tokens,
+            optimize_vocoder=optimize_vocoder,
+            voice_registry_path=voice_registry_path,
+            metrics=metrics,
+        )
+
+
+    def _setup(
+        self,
+        model,
+        tokenizer,
+        audio_tokenizer: BiCodecTokenizer,
+        device: torch.device,
+        max_seq_length: int = 2048,
+        use_speaker_cache: bool = False,
+        speaker_cache_path: Optional[str] = None,
+        static_cache: bool = False,
+        compile_decode: bool = False,
+        prefix_cache: bool = False,
+        vocoder_chunk_tokens: Optional[int] = None,
+        optimize_vocoder: bool = False,
+        voice_registry_path: Optional[str] = None,
+        metrics: Optional[Metrics] = None,
+    ) -> None:
+        """Attach loaded models to the instance, see `__init__` for the options."""
+        self._device = device
+        self._max_seq_length = max_seq_length
+        self._model, self._tokenizer = model, tokenizer
+        self._static_cache = static_cache or compile_decode
+        self._static_caches: Dict[int, List[StaticCache]] = {}
+        self._compile_config = self._build_compile_config() if compile_decode else None
+        self._use_prefix_cache = prefix_cache
+        self._prefix_caches: Dict[Optional[str], Tuple[torch.Tensor, DynamicCache]] = {}
+        self._audio_tokenizer = audio_tokenizer
+        if optimize_vocoder:
+            self._audio_tokenizer.model.optimize_for_inference(time_major=False)
+        self._token_map = BiCodecTokenMap(self._tokenizer)
+        self._vocoder_chunk_tokens = vocoder_chunk_tokens
+        self._speaker_cache = SpeakerCache(speaker_cache_path, self._device) if use_speaker_cache else None
+        self._voices = SpeakerCache(voice_registry_path, self._device)
+        self._metrics = metrics or NULL_METRICS
+        self._audio_tokenizer.model.metrics = self._metrics
+
+
+    @classmethod
+    def from_components(
+        cls,
+        model,
+        tokenizer,
+        audio_tokenizer: BiCodecTokenizer,
+        device: Optional[torch.device] = None,
+        **options,
+    ) -> "BambaraTTSInference":
+        """
+        Build the inference class around already loaded models instead of downloading them,
+        e.g. the small random models of `maliba_ai.benchmarks`.
+
+        Args:
+            model: Causal LM generating the BiCodec tokens, in inference mode.
+            tokenizer: Tokenizer of the LM, holding the Spark-TTS special and BiCodec tokens.
+            audio_tokenizer (BiCodecTokenizer): Audio tokenizer turning BiCodec tokens into audio.
+            device (torch.device, optional): Device of the models, CUDA when available by default.
+            **options: Any other argument of `__init__` but `model_path` and `detokenize_only`.
+        """
+        tts = cls.__new__(cls)
+        device = device or torch.device("cuda" if torch.cuda.is_available() else "cpu")
+        tts._setup(model, tokenizer, audio_tokenizer, device, **options)
+        return tts
+
+
+    @staticmethod
+    def _build_prompt(text: str, global_tokens: Optional[torch.Tensor] = None) -> str:
+        """
+        Wrap pre-formatted text into the Spark-TTS generation prompt.
+
+        When the global tokens of the speaker are given, the prompt already holds the whole
+        global block and generation starts at the semantic tokens.
+        """
+        prompt = [
+            "<|task_tts|>",
+            "<|start_content|>",
+            text,
+            "<|end_content|>",
+            "<|start_global_token|>"
+        ]
+        if global_tokens is not None:
+            prompt += [f"<|bicodec_global_{token}|>" for token in global_tokens.tolist()]
+            prompt += ["<|end_global_token|>", "<|start_semantic_token|>"]
+        return "".join(prompt)
+
+
+    def _format_text(self, text: str, speaker_id: Optional[Voice]) -> str:
+        """
+        Validate the inputs of a request and prefix the text with its speaker ID.
+        Cloned voices are given by their global tokens instead, so their text has no prefix.
+        """
+        if isinstance(speaker_id, ClonedVoice):
+            if speaker_id.id not in self._voices:
+                raise ValueError(f"Voice '{speaker_id.name}' is not registered")
+        elif speaker_id and speaker_id.id.upper() not in Settings.speakers_ids :
+            raise ValueError("This speaker is not supported")
+
+        if not text :
+            raise ValueError("text can not be empty")
+
+        if not isinstance(text, str):
+            raise TypeError("text should be a string")
+
+        if isinstance(speaker_id, ClonedVoice):
+            return text
+
+        return f"{speaker_id.id}: " + text  if speaker_id else text
+
+
+    def _grammar_processor(self, prompt_length: int, prefilled: bool = False) -> LogitsProcessorList:
+        """Logits processors restricting generation to well-formed BiCodec token sequences."""
+        return LogitsProcessorList([
+            BiCodecGrammarLogitsProcessor.from_tokenizer(
+                self._tokenizer,
+                self._token_map,
+                prompt_length=prompt_length,
+                num_global_tokens=0 if prefilled else self._audio_tokenizer.model.speaker_encoder.token_num,
+            )
+        ])
+
+
+    def _generation_processors(
+        self, prompt_length: int, prefilled: bool, prefill_tokens: int
+    ) -> Tuple[LogitsProcessorList, Optional[GenerationStageProcessor]]:
+        """
+        Logits processors of a `generate` call, with the processor timing its prefill and decode
+        stages when metrics are enabled. That processor must be closed once `generate` returns.
+        """
+        logits_processor = self._grammar_processor(prompt_length, prefilled=prefilled)
+        if not self._metrics.enabled:
+            return logits_processor, None
+        stages = GenerationStageProcessor(self._metrics, prefill_tokens)
+        logits_processor.append(stages)
+        return logits_processor, stages
+
+
+    def _build_compile_config(self) -> "CompileConfig":
+        """Compilation settings of the decode step, enabled on every device."""
+        # generate only compiles on GPU unless the private `_compile_all_devices` flag is set
+        on_gpu = self._device.type == "cuda"
+        if CompileConfig is None or not (on_gpu or hasattr(CompileConfig, "_compile_all_devices")):
+            raise RuntimeError(
+                f"compile_decode is not supported on {self._device.type} with transformers "
+                f"{transformers.__version__}, its generate can not compile the decode step there"
+            )
+        # cuda graphs only pay off on GPU, the default mode fuses kernels everywhere else
+        compile_config = CompileConfig(mode="reduce-overhead" if on_gpu else "default")
+        compile_config._compile_all_devices = True
+        return compile_config
+
+
+    def _new_static_cache(self, batch_size: int) -> StaticCache:
+        kwargs = {"config": self._model.config, "max_cache_len": self._max_seq_length}
+        # older transformers releases allocate the cache eagerly and need its full shape upfront
+        if "max_batch_size" in inspect.signature(StaticCache.__init__).parameters:
+            kwargs.update(max_batch_size=batch_size, device=self._device, dtype=self._model.dtype)
+        return StaticCache(**kwargs)
+
+
+    @staticmethod
+    def _prompt_prefix(speaker_key: Optional[str]) -> str:
+        """Start of the prompt shared by every request of a speaker, see `_build_prompt` and `_format_text`."""
+        return "<|task_tts|><|start_content|>" + (f"{speaker_key}:" if speaker_key else "")
+
+
+    @torch.inference_mode()
+    def _prefix_kv_cache(self, speaker_key: Optional[str], input_ids: torch.Tensor) -> Optional[DynamicCache]:
+        """
+        Copy of the KV cache of the prompt prefix of a speaker, computed on first use.
+
+        Returns None when prefix caching is disabled or does not apply, e.g. when the prompt
+        does not tokenize to the cached prefix followed by the rest of the prompt.
         """
-        self._device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-        self._model, self._tokenizer = load_tts_model(model_path=model_path, max_seq_length=max_seq_length)
-        self._audio_tokenizer = load_audio_tokenizer(self._device)
-    
+        if not self._use_prefix_cache or self._static_cache or input_ids.shape[0] != 1:
+            return None
+
+        # prompts of cloned voices have no speaker prefix
+        if speaker_key in self._voices:
+            speaker_key = None
+
+        if speaker_key not in self._prefix_caches:
+            prefix_ids = self._tokenizer([self._prompt_prefix(speaker_key)], return_tensors="pt").input_ids.to(self._device)
+            outputs = self._model(input_ids=prefix_ids, past_key_values=DynamicCache(), use_cache=True)
+            self._prefix_caches[speaker_key] = (prefix_ids, outputs.past_key_values)
+
+        prefix_ids, prefix_cache = self._prefix_caches[speaker_key]
+        prefix_length = prefix_ids.shape[1]
+        if prefix_length >= input_ids.shape[1] or not torch.equal(input_ids[0, :prefix_length], prefix_ids[0]):
+            return None
+        # generate appends to the cache it is given, so every request works on its own copy
+        return copy.deepcopy(prefix_cache)
+
+
+    @contextmanager
+    def _decoding_options(
+        self,
+        batch_size: int,
+        prompt_length: int,
+        max_new_audio_tokens: int,
+        prefix_cache: Optional[DynamicCache] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Cache and length arguments of a `generate` call.
+
+        With the static cache enabled, a preallocated cache of the batch size is taken from the
+        pool for the duration of the call, then reset and given back, so concurrent calls never
+        share a cache. Generation is capped to the room left in the cache. Otherwise the KV cache
+        of the prompt prefix is attached when there is one.
+        """
+        if not self._static_cache:
+            options = {"max_new_tokens": max_new_audio_tokens}
+            if prefix_cache is not None:
+                options["past_key_values"] = prefix_cache
+            yield options
+            return
+
+        if prompt_length >= self._max_seq_length:
+            raise ValueError("text is too long for max_seq_length")
+
+        pool = self._static_caches.setdefault(batch_size, [])
+        cache = pool.pop() if pool else self._new_static_cache(batch_size)
+        options = {
+            "past_key_values": cache,
+            "max_new_tokens": min(max_new_audio_tokens, self._max_seq_length - prompt_length),
+        }
+        if self._compile_config is not None:
+            options["compile_config"] = self._compile_config
+        try:
+            yield options
+        finally:
+            cache.reset()
+            pool.append(cache)
+
+
+    def _lookup_speaker(self, speaker_key: Optional[str]) -> Optional[SpeakerEntry]:
+        """Conditioning of a registered voice, or cached conditioning of a speaker if the speaker cache knows it."""
+        if speaker_key is None:
+            return None
+        voice = self._voices.get(speaker_key)
+        if voice is not None or self._speaker_cache is None:
+            return voice
+        return self._speaker_cache.get(speaker_key)
+
+
+    def _remember_speaker(
+        self,
+        speaker_key: Optional[str],
+        global_ids: torch.Tensor,
+        d_vector: torch.Tensor,
+        prepared: Optional[PreparedSpeaker] = None,
+    ) -> None:
+        """Store freshly generated global tokens of a speaker in the speaker cache."""
+        if self._speaker_cache is None or speaker_key is None or speaker_key in self._speaker_cache:
+            return
+        self._speaker_cache.put(speaker_key, global_ids, d_vector, prepared=prepared)
+
+
+    def _prepare_speaker(self, speaker_key: Optional[str], global_ids: torch.Tensor) -> PreparedSpeaker:
+        """Precompute the vocoder conditioning of generated global tokens, caching it when enabled."""
+        prepared = self._audio_tokenizer.prepare_speaker(global_ids.to(self._device).unsqueeze(0))
+        self._remember_speaker(speaker_key, global_ids, prepared.d_vector, prepared)
+        return prepared
+
+
+    def _cached_speaker_condition(self, speaker: SpeakerEntry) -> PreparedSpeaker:
+        """Vocoder conditioning of a cached speaker, built on first use."""
+        if speaker.prepared is None:
+            speaker.prepared = self._audio_tokenizer.prepare_speaker(
+                speaker.global_tokens.unsqueeze(0), d_vector=speaker.d_vector
+            )
+        return speaker.prepared
+
 
     @torch.inference_mode()
     def _generate_speech_from_text(
@@ -28,117 +375,811 @@ class BambaraTTSInference:
         top_k: int = 50,
         top_p: float = 1.0,
         max_new_audio_tokens: int = 2048,
+        speaker_key: Optional[str] = None,
     ) -> np.ndarray:
         """
         Generate speech from pre-formatted text.
-        
+
         Args:
             text (str): Pre-formatted text (with speaker ID if applicable).
             temperature (float): Sampling temperature (default: 0.8).
             top_k (int): Top-k sampling parameter (default: 50).
             top_p (float): Top-p sampling parameter (default: 1.0).
             max_new_audio_tokens (int): Maximum audio tokens to generate (default: 2048).
-            
+            speaker_key (str, optional): Speaker cache key of the request.
+
         Returns:
             np.ndarray: Generated waveform as a NumPy array.
         """
-        prompt = "".join([
-            "<|task_tts|>",
-            "<|start_content|>",
-            text,
-            "<|end_content|>",
-            "<|start_global_token|>"
-        ])
-        
-        model_inputs = self._tokenizer([prompt], return_tensors="pt").to(self._device)
-    
-        generated_ids = self._model.generate(
-            **model_inputs,
-            max_new_tokens=max_new_audio_tokens,
-            do_sample=True,
+        speaker = self._lookup_speaker(speaker_key)
+        prompt = self._build_prompt(text, speaker.global_tokens if speaker else None)
+
+        with self._metrics.stage("prompt_tokenize") as stage:
+            model_inputs = self._tokenizer([prompt], return_tensors="pt").to(self._device)
+            stage.tokens = model_inputs.input_ids.numel()
+
+        prompt_length = model_inputs.input_ids.shape[1]
+        prefix_cache = self._prefix_kv_cache(speaker_key, model_inputs.input_ids)
+        prefill_tokens = prompt_length - (prefix_cache.get_seq_length() if prefix_cache is not None else 0)
+        logits_processor, stages = self._generation_processors(prompt_length, speaker is not None, prefill_tokens)
+        try:
+            with self._decoding_options(
+                1, prompt_length, max_new_audio_tokens, prefix_cache
+            ) as decoding_options:
+                generated_ids = self._model.generate(
+                    **model_inputs,
+                    **decoding_options,
+                    do_sample=True,
+                    temperature=temperature,
+                    top_k=top_k,
+                    top_p=top_p,
+                    eos_token_id=self._tokenizer.eos_token_id,
+                    pad_token_id=self._tokenizer.pad_token_id,
+                    logits_processor=logits_processor
+                )
+        finally:
+            if stages is not None:
+                stages.close()
+
+        generated_ids_trimmed = generated_ids[:, prompt_length:]
+        with self._metrics.stage("token_extraction", tokens=generated_ids_trimmed.numel()):
+            global_matches, semantic_matches = self._token_map.extract(generated_ids_trimmed[0])
+        num_global_tokens = self._audio_tokenizer.model.speaker_encoder.token_num
+        if speaker is not None:
+            global_matches = speaker.global_tokens
+
+        # the grammar only leaves an incomplete global block when max_new_audio_tokens is too small
+        if semantic_matches.numel() == 0 or global_matches.numel() != num_global_tokens:
+            return np.array([], dtype=np.float32)
+
+        with self._metrics.stage("to_device", tokens=semantic_matches.numel() + global_matches.numel()):
+            pred_semantic_ids = semantic_matches.unsqueeze(0).to(self._device)              # Shape: (1, N_semantic)
+            pred_global_ids = global_matches.unsqueeze(0).unsqueeze(0).to(self._device)     # Shape: (1, 1, N_global)
+
+            self._audio_tokenizer.device = self._device
+            self._audio_tokenizer.model.to(self._device)
+
+        if speaker is None:
+            prepared_speaker = self._prepare_speaker(speaker_key, global_matches)
+        else:
+            prepared_speaker = self._cached_speaker_condition(speaker)
+
+        wav_np = self._audio_tokenizer.detokenize(
+            pred_global_ids.squeeze(0),  # Shape: (1, N_global)
+            pred_semantic_ids,           # Shape: (1, N_semantic)
+            prepared_speaker=prepared_speaker,
+            chunk_tokens=self._vocoder_chunk_tokens
+        )
+
+        return wav_np
+
+
+    @torch.inference_mode()
+    def _generate_audio_tokens(
+        self,
+        texts: Sequence[str],
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+        speaker_keys: Optional[Sequence[Optional[str]]] = None,
+        streamer: Optional[BaseStreamer] = None,
+    ) -> List[Optional[Tuple[torch.Tensor, torch.Tensor]]]:
+        """
+        LM stage of batched synthesis: sample the BiCodec tokens of pre-formatted texts with one `generate` call.
+
+        Args:
+            texts (Sequence[str]): Pre-formatted texts (with speaker ID if applicable).
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate per item (default: 2048).
+            speaker_keys (Sequence[str], optional): Speaker cache key of each text.
+            streamer (BaseStreamer, optional): Streamer given to `generate`, e.g. to time the decode steps.
+
+        Returns:
+            List: One (global_ids, semantic_ids) pair per text, None when no usable audio tokens were produced.
+        """
+        speakers = [self._lookup_speaker(key) for key in speaker_keys or [None] * len(texts)]
+        # all rows of a batch share the grammar phase, so prompts are prefilled only if every speaker is cached
+        prefilled = all(speaker is not None for speaker in speakers)
+        if not prefilled and any(speaker is not None for speaker in speakers):
+            # cached speakers keep their global tokens (and cloned voices only exist as global tokens),
+            # so they are generated apart from the items that sample theirs
+            return self._generate_audio_tokens_split(
+                texts,
+                [speaker is not None for speaker in speakers],
+                temperature=temperature,
+                top_k=top_k,
+                top_p=top_p,
+                max_new_audio_tokens=max_new_audio_tokens,
+                speaker_keys=speaker_keys,
+                streamer=streamer,
+            )
+        prompts = [
+            self._build_prompt(text, speaker.global_tokens if prefilled else None)
+            for text, speaker in zip(texts, speakers)
+        ]
+
+        # decoder-only models need the padding on the left so that every row continues from its own prompt
+        padding_side = self._tokenizer.padding_side
+        self._tokenizer.padding_side = "left"
+        try:
+            with self._metrics.stage("prompt_tokenize") as stage:
+                model_inputs = self._tokenizer(prompts, return_tensors="pt", padding=True).to(self._device)
+                stage.tokens = model_inputs.input_ids.numel()
+        finally:
+            self._tokenizer.padding_side = padding_side
+
+        batch_size, prompt_length = model_inputs.input_ids.shape
+        # the prefix KV cache only applies to unpadded prompts, i.e. to batches of one text
+        prefix_cache = self._prefix_kv_cache(speaker_keys[0] if speaker_keys else None, model_inputs.input_ids)
+        prefill_tokens = int(model_inputs.attention_mask.sum())
+        if prefix_cache is not None:
+            prefill_tokens -= prefix_cache.get_seq_length()
+        logits_processor, stages = self._generation_processors(prompt_length, prefilled, prefill_tokens)
+        try:
+            with self._decoding_options(
+                batch_size, prompt_length, max_new_audio_tokens, prefix_cache
+            ) as decoding_options:
+                generated_ids = self._model.generate(
+                    **model_inputs,
+                    **decoding_options,
+                    do_sample=True,
+                    temperature=temperature,
+                    top_k=top_k,
+                    top_p=top_p,
+                    eos_token_id=self._tokenizer.eos_token_id,
+                    pad_token_id=self._tokenizer.pad_token_id,
+                    logits_processor=logits_processor,
+                    streamer=streamer,
+                )
+        finally:
+            if stages is not None:
+                stages.close()
+
+        generated_ids_trimmed = generated_ids[:, model_inputs.input_ids.shape[1]:]
+        num_global_tokens = self._audio_tokenizer.model.speaker_encoder.token_num
+
+        audio_tokens = []
+        with self._metrics.stage("token_extraction", tokens=generated_ids_trimmed.numel()):
+            for i, (global_matches, semantic_matches) in enumerate(self._token_map.extract_batch(generated_ids_trimmed)):
+                if prefilled:
+                    global_matches = speakers[i].global_tokens
+                # items without a complete global block can not be vocoded together with the others
+                if semantic_matches.numel() == 0 or global_matches.numel() != num_global_tokens:
+                    audio_tokens.append(None)
+                else:
+                    audio_tokens.append((global_matches, semantic_matches))
+        return audio_tokens
+
+
+    def _generate_audio_tokens_split(
+        self,
+        texts: Sequence[str],
+        prefilled: Sequence[bool],
+        speaker_keys: Sequence[Optional[str]],
+        **generate_kwargs,
+    ) -> List[Optional[Tuple[torch.Tensor, torch.Tensor]]]:
+        """Run `_generate_audio_tokens` separately on the prefilled and the other items, keeping their order."""
+        audio_tokens: List[Optional[Tuple[torch.Tensor, torch.Tensor]]] = [None] * len(texts)
+        for group in (True, False):
+            items = [i for i, flag in enumerate(prefilled) if flag is group]
+            outputs = self._generate_audio_tokens(
+                [texts[i] for i in items], speaker_keys=[speaker_keys[i] for i in items], **generate_kwargs
+            )
+            for i, tokens in zip(items, outputs):
+                audio_tokens[i] = tokens
+        return audio_tokens
+
+
+    @torch.inference_mode()
+    def _vocode_audio_tokens(
+        self,
+        audio_tokens: Sequence[Optional[Tuple[torch.Tensor, torch.Tensor]]],
+        speaker_keys: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[np.ndarray]:
+        """
+        Vocoder stage of batched synthesis: turn the output of `_generate_audio_tokens` into
+        waveforms with one padded BiCodec pass.
+
+        Args:
+            audio_tokens (Sequence): One (global_ids, semantic_ids) pair or None per item.
+            speaker_keys (Sequence[str], optional): Speaker cache key of each item.
+
+        Returns:
+            List[np.ndarray]: One waveform per item, empty when it has no audio tokens.
+        """
+        speaker_keys = speaker_keys or [None] * len(audio_tokens)
+        waveforms = [np.array([], dtype=np.float32) for _ in audio_tokens]
+        valid_items = [i for i, tokens in enumerate(audio_tokens) if tokens is not None]
+        if not valid_items:
+            return waveforms
+
+        global_ids = [audio_tokens[i][0] for i in valid_items]
+        semantic_ids = [audio_tokens[i][1] for i in valid_items]
+        lengths = [len(ids) for ids in semantic_ids]
+        with self._metrics.stage("to_device") as stage:
+            # detokenize_batch decodes the tails that see the padding again, so its value does not matter
+            pred_semantic_ids = torch.nn.utils.rnn.pad_sequence(semantic_ids, batch_first=True)  # Shape: (B, N_semantic)
+            pred_global_ids = torch.stack(global_ids).to(self._device)  # Shape: (B, N_global)
+            pred_semantic_ids = pred_semantic_ids.to(self._device)
+            stage.tokens = pred_semantic_ids.numel() + pred_global_ids.numel()
+
+            self._audio_tokenizer.device = self._device
+            self._audio_tokenizer.model.to(self._device)
+
+        speakers = [self._lookup_speaker(speaker_keys[i]) for i in valid_items]
+        if all(speaker is not None and torch.equal(speaker.global_tokens, ids) for speaker, ids in zip(speakers, global_ids)):
+            d_vector = torch.cat([speaker.d_vector for speaker in speakers])
+            prepared_speaker = self._audio_tokenizer.prepare_speaker(pred_global_ids, d_vector)
+        else:
+            prepared_speaker = self._audio_tokenizer.prepare_speaker(pred_global_ids)
+            for row, (i, ids) in enumerate(zip(valid_items, global_ids)):
+                self._remember_speaker(speaker_keys[i], ids, prepared_speaker.d_vector[row:row + 1])
+
+        wavs = self._audio_tokenizer.detokenize_batch(
+            pred_global_ids,
+            pred_semantic_ids,
+            lengths,
+            prepared_speaker=prepared_speaker,
+            chunk_tokens=self._vocoder_chunk_tokens,
+        )
+        for i, wav in zip(valid_items, wavs):
+            waveforms[i] = wav
+
+        return waveforms
+
+
+    def _generate_speech_from_texts(
+        self,
+        texts: Sequence[str],
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+        speaker_keys: Optional[Sequence[Optional[str]]] = None,
+    ) -> List[np.ndarray]:
+        """
+        Generate speech for a batch of pre-formatted texts with one `generate` call
+        and one padded vocoder pass.
+
+        Args:
+            texts (Sequence[str]): Pre-formatted texts (with speaker ID if applicable).
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate per item (default: 2048).
+            speaker_keys (Sequence[str], optional): Speaker cache key of each text.
+
+        Returns:
+            List[np.ndarray]: One waveform per text, empty when no audio tokens were produced.
+        """
+        audio_tokens = self._generate_audio_tokens(
+            texts,
             temperature=temperature,
             top_k=top_k,
             top_p=top_p,
-            eos_token_id=self._tokenizer.eos_token_id,
-            pad_token_id=self._tokenizer.pad_token_id
+            max_new_audio_tokens=max_new_audio_tokens,
+            speaker_keys=speaker_keys,
         )
+        return self._vocode_audio_tokens(audio_tokens, speaker_keys)
+
+
+    def _stream_speech_from_text(
+        self,
+        text: str,
+        chunk_tokens: int = 40,
+        overlap_tokens: int = 8,
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+        speaker_key: Optional[str] = None,
+    ) -> Iterator[np.ndarray]:
+        """
+        Generate speech from pre-formatted text, vocoding semantic tokens while they are sampled.
+
+        Every window covers `chunk_tokens + overlap_tokens` semantic tokens; consecutive windows
+        share `overlap_tokens` tokens, whose two renderings are cross-faded.
+
+        Args:
+            text (str): Pre-formatted text (with speaker ID if applicable).
+            chunk_tokens (int): Semantic tokens emitted per chunk (default: 40, i.e. 0.8 s).
+            overlap_tokens (int): Semantic tokens shared by consecutive windows (default: 8).
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate (default: 2048).
+            speaker_key (str, optional): Speaker cache key of the request.
+
+        Yields:
+            np.ndarray: Consecutive waveform chunks.
+        """
+        speaker = self._lookup_speaker(speaker_key)
+        prompt = self._build_prompt(text, speaker.global_tokens if speaker else None)
+        with self._metrics.stage("prompt_tokenize") as stage:
+            model_inputs = self._tokenizer([prompt], return_tensors="pt").to(self._device)
+            stage.tokens = model_inputs.input_ids.numel()
+
+        streamer = TokenIdStreamer()
+
+        prompt_length = model_inputs.input_ids.shape[1]
+        prefix_cache = self._prefix_kv_cache(speaker_key, model_inputs.input_ids)
+
+        def _generate():
+            prefill_tokens = prompt_length - (prefix_cache.get_seq_length() if prefix_cache is not None else 0)
+            logits_processor, stages = self._generation_processors(
+                prompt_length, speaker is not None, prefill_tokens
+            )
+            try:
+                with torch.inference_mode(), \
+                        self._decoding_options(1, prompt_length, max_new_audio_tokens, prefix_cache) as decoding_options:
+                    self._model.generate(
+                        **model_inputs,
+                        **decoding_options,
+                        do_sample=True,
+                        temperature=temperature,
+                        top_k=top_k,
+                        top_p=top_p,
+                        eos_token_id=self._tokenizer.eos_token_id,
+                        pad_token_id=self._tokenizer.pad_token_id,
+                        logits_processor=logits_processor,
+                        streamer=streamer,
+                        stopping_criteria=StoppingCriteriaList([StreamerCancelCriteria(streamer)]),
+                    )
+            except Exception as error:
+                streamer.fail(error)
+            finally:
+                if stages is not None:
+                    stages.close()
+                streamer.end()
 
-        generated_ids_trimmed = generated_ids[:, model_inputs.input_ids.shape[1]:]
-        predicted_text = self._tokenizer.batch_decode(generated_ids_trimmed, skip_special_tokens=False)[0]
-    
-        semantic_matches = re.findall(r"<\|bicodec_semantic_(\d+)\|>", predicted_text)
-        global_matches = re.findall(r"<\|bicodec_global_(\d+)\|>", predicted_text)
-        
-        if not semantic_matches:
-            return np.array([], dtype=np.float32)
-        
-        pred_semantic_ids = torch.tensor([int(token) for token in semantic_matches]).long().unsqueeze(0)
-        
-        if not global_matches:
-            pred_global_ids = torch.zeros((1, 1), dtype=torch.long)
-        else:
-            pred_global_ids = torch.tensor([int(token) for token in global_matches]).long().unsqueeze(0)
-        
-        pred_global_ids = pred_global_ids.unsqueeze(0)  # Shape: (1, 1, N_global)
-        
         self._audio_tokenizer.device = self._device
         self._audio_tokenizer.model.to(self._device)
-        
-        wav_np = self._audio_tokenizer.detokenize(
-            pred_global_ids.to(self._device).squeeze(0),  # Shape: (1, N_global)
-            pred_semantic_ids.to(self._device)            # Shape: (1, N_semantic)
-        )
-        
-        return wav_np
+        num_global_tokens = self._audio_tokenizer.model.speaker_encoder.token_num
+
+        global_ids: List[int] = speaker.global_tokens.tolist() if speaker else []
+        semantic_ids: List[int] = []
+        window_tokens = chunk_tokens + overlap_tokens
+        start = 0
+        tail = None
+        # the speaker conditioning is shared by every window, so it is computed once per stream
+        prepared_speaker = self._cached_speaker_condition(speaker) if speaker else None
+
+        def _vocode(end: int) -> np.ndarray:
+            with torch.inference_mode():
+                return np.atleast_1d(self._audio_tokenizer.detokenize(
+                    torch.tensor([global_ids[:num_global_tokens]], device=self._device),
+                    torch.tensor([semantic_ids[start:end]], device=self._device),
+                    prepared_speaker=prepared_speaker,
+                ))
+
+        thread = threading.Thread(target=_generate, daemon=True)
+        thread.start()
+        try:
+            for new_ids in streamer:
+                new_global_ids, new_semantic_ids = self._token_map.extract(torch.tensor(new_ids))
+                global_ids.extend(new_global_ids.tolist())
+                semantic_ids.extend(new_semantic_ids.tolist())
+                if len(global_ids) < num_global_tokens:
+                    continue
+                if prepared_speaker is None:
+                    with torch.inference_mode():
+                        prepared_speaker = self._prepare_speaker(
+                            speaker_key, torch.tensor(global_ids[:num_global_tokens])
+                        )
+
+                while len(semantic_ids) - start >= window_tokens:
+                    wav = _vocode(start + window_tokens)
+                    hop_length = len(wav) // window_tokens
+                    chunk = wav[: chunk_tokens * hop_length]
+                    if tail is not None:
+                        chunk[: len(tail)] = crossfade(tail, chunk)
+                    tail = wav[chunk_tokens * hop_length:]
+                    start += chunk_tokens
+                    yield chunk
+
+            if len(global_ids) < num_global_tokens or len(semantic_ids) <= start:
+                return
+
+            if tail is not None and len(semantic_ids) - start == overlap_tokens:
+                yield tail
+                return
+
+            wav = _vocode(len(semantic_ids))
+            if tail is not None:
+                wav[: len(tail)] = crossfade(tail, wav)
+            yield wav
+        finally:
+            streamer.cancel()
+            thread.join()
+
+
+    def register_voice(self, name: str, wav_path: str) -> ClonedVoice:
+        """
+        Clone a voice from a reference recording, for use as `speaker_id` in every synthesis method.
+
+        The global tokens of the voice are extracted once from a clip of the recording and kept,
+        with their d-vector, in the voice registry (persisted when `voice_registry_path` is set).
+        Prompts of the voice are then prefilled with its global tokens, so it costs no more per
+        request than a cached built-in speaker. The audio tokenizer must not be loaded with
+        `detokenize_only`.
+
+        Args:
+            name (str): Name of the voice, replacing any voice registered under the same name.
+            wav_path (str): Reference recording of the voice, a few seconds of clean speech.
+
+        Returns:
+            ClonedVoice: The registered voice.
+        """
+        if not name or not isinstance(name, str):
+            raise ValueError("name should be a non empty string")
+
+        if name.upper() in Settings.speakers_ids:
+            raise ValueError(f"'{name}' is the ID of a built-in speaker")
+
+        self._audio_tokenizer.device = self._device
+        self._audio_tokenizer.model.to(self._device)
+        with torch.inference_mode():
+            global_tokens = self._audio_tokenizer.tokenize_speaker(wav_path).reshape(1, -1)
+            d_vector = self._audio_tokenizer.model.speaker_encoder.detokenize(global_tokens.unsqueeze(1))
+
+        self._voices.put(name, global_tokens, d_vector)
+        return ClonedVoice(name)
+
+
+    def registered_voices(self) -> List[ClonedVoice]:
+        """Voices of the voice registry."""
+        return [ClonedVoice(name) for name in self._voices.keys()]
 
 
     def generate_speech(
         self,
         text: str,
-        speaker_id:Optional[SingleSpeaker]  = Adama,
+        speaker_id:Optional[Voice]  = Adama,
         temperature: float = 0.8,
         top_k: int = 50,
         top_p: float = 1.0,
         max_new_audio_tokens: int = 2048,
         output_filename: str = None
     ) -> np.ndarray:
-        
+
         """
         Generate speech from text with optional speaker ID.
-        
+
         Args:
             text (str): Input text in Bambara to convert to speech.
-            speaker_id (str, optional): Speaker identifier (e.g., "SPEAKER_01", "SPEAKER_18").
+            speaker_id (Voice, optional): Speaker or cloned voice to use (default: Adama).
             temperature (float): Sampling temperature (default: 0.8).
             top_k (int): Top-k sampling parameter (default: 50).
             top_p (float): Top-p sampling parameter (default: 1.0).
             max_new_audio_tokens (int): Maximum audio tokens to generate (default: 2048).
             output_filename (str, optional): Name of output audio file.
-            
+
         Returns:
             np.ndarray: Generated waveform as a NumPy array.
         """
 
-        if speaker_id.id.upper() not in Settings.speakers_ids : 
-            raise ValueError("This speaker is not supported")
-        
-        if not text : 
-            raise ValueError("text can not be empty")
-        
-        if not isinstance(text, str):
-            raise TypeError("text should be a string")
-                
-        formatted_text = f"{speaker_id.id}: " + text  if speaker_id else text
+        formatted_text = self._format_text(text, speaker_id)
         generated_waveform = self._generate_speech_from_text(
             text=formatted_text,
             temperature=temperature,
             top_k=top_k,
             top_p=top_p,
-            max_new_audio_tokens=max_new_audio_tokens
+            max_new_audio_tokens=max_new_audio_tokens,
+            speaker_key=speaker_id.id if speaker_id else None
         )
-        
+
         if generated_waveform.size > 0 and output_filename:
             sample_rate = self._audio_tokenizer.config.get("sample_rate", 16000)
-            sf.write(output_filename, generated_waveform, sample_rate)
-        
-        return generated_waveform
\ No newline at end of file
+            with self._metrics.stage("file_write"):
+                sf.write(output_filename, generated_waveform, sample_rate)
+
+        return generated_waveform
+
+
+    def generate_speech_batch(
+        self,
+        texts: Sequence[str],
+        speakers: Union[Voice, Sequence[Voice]] = Adama,
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+        output_filenames: Optional[Sequence[str]] = None
+    ) -> List[np.ndarray]:
+
+        """
+        Generate speech for several texts at once, sharing a single model call.
+
+        Args:
+            texts (Sequence[str]): Input texts in Bambara to convert to speech.
+            speakers (Voice or Sequence[Voice]): One speaker or cloned voice for all texts,
+                or one speaker per text.
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate per text (default: 2048).
+            output_filenames (Sequence[str], optional): Names of output audio files, one per text.
+
+        Returns:
+            List[np.ndarray]: Generated waveforms, in the same order as `texts`.
+        """
+
+        if isinstance(texts, str) or not texts:
+            raise ValueError("texts should be a non empty list of strings")
+
+        if speakers is None or isinstance(speakers, (SingleSpeaker, ClonedVoice)):
+            speakers = [speakers] * len(texts)
+
+        if len(speakers) != len(texts):
+            raise ValueError("speakers should contain one speaker per text")
+
+        if output_filenames is not None and len(output_filenames) != len(texts):
+            raise ValueError("output_filenames should contain one filename per text")
+
+        formatted_texts = [self._format_text(text, speaker) for text, speaker in zip(texts, speakers)]
+        generated_waveforms = self._generate_speech_from_texts(
+            texts=formatted_texts,
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            max_new_audio_tokens=max_new_audio_tokens,
+            speaker_keys=[speaker.id if speaker else None for speaker in speakers]
+        )
+
+        if output_filenames:
+            sample_rate = self._audio_tokenizer.config.get("sample_rate", 16000)
+            for waveform, output_filename in zip(generated_waveforms, output_filenames):
+                if waveform.size > 0 and output_filename:
+                    with self._metrics.stage("file_write"):
+                        sf.write(output_filename, waveform, sample_rate)
+
+        return generated_waveforms
+
+
+    def generate_speech_pipelined(
+        self,
+        texts: Sequence[str],
+        speakers: Union[Voice, Sequence[Voice]] = Adama,
+        batch_size: int = 1,
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+        stage_threads: Optional[int] = None,
+        max_pending_batches: int = 2,
+    ) -> Iterator[np.ndarray]:
+
+        """
+        Generate speech for a long list of texts, overlapping LM sampling and vocoding.
+
+        Texts are processed in batches of `batch_size`; while the vocoder thread synthesizes the
+        waveforms of one batch, the LM already samples the tokens of the next one.
+
+        Args:
+            texts (Sequence[str]): Input texts in Bambara to convert to speech.
+            speakers (Voice or Sequence[Voice]): One speaker or cloned voice for all texts,
+                or one speaker per text.
+            batch_size (int): Texts sampled together in one `generate` call (default: 1).
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate per text (default: 2048).
+            stage_threads (int, optional): Torch intra-op threads of each stage, left unchanged by
+                default. The two stages run at the same time in this process and the intra-op thread
+                count is process-wide: when given, it applies to every thread of the process, including
+                while the caller holds the generator between waveforms, and is only restored once
+                the generator is exhausted or closed.
+            max_pending_batches (int): Batches waiting for the vocoder before the LM pauses (default: 2).
+
+        Yields:
+            np.ndarray: Generated waveforms, in the same order as `texts`.
+        """
+
+        if isinstance(texts, str) or not texts:
+            raise ValueError("texts should be a non empty list of strings")
+
+        if speakers is None or isinstance(speakers, (SingleSpeaker, ClonedVoice)):
+            speakers = [speakers] * len(texts)
+
+        if len(speakers) != len(texts):
+            raise ValueError("speakers should contain one speaker per text")
+
+        if batch_size <= 0:
+            raise ValueError("batch_size should be positive")
+
+        formatted_texts = [self._format_text(text, speaker) for text, speaker in zip(texts, speakers)]
+        speaker_keys = [speaker.id if speaker else None for speaker in speakers]
+
+        if stage_threads is not None and stage_threads <= 0:
+            raise ValueError("stage_threads should be positive")
+
+        previous_threads = torch.get_num_threads()
+        if stage_threads is not None:
+            torch.set_num_threads(stage_threads)
+        worker = VocoderWorker(self._vocode_audio_tokens, max_pending=max_pending_batches).start()
+        try:
+            for start in range(0, len(formatted_texts), batch_size):
+                batch_keys = speaker_keys[start:start + batch_size]
+                audio_tokens = self._generate_audio_tokens(
+                    formatted_texts[start:start + batch_size],
+                    temperature=temperature,
+                    top_k=top_k,
+                    top_p=top_p,
+                    max_new_audio_tokens=max_new_audio_tokens,
+                    speaker_keys=batch_keys,
+                )
+                worker.submit(audio_tokens, batch_keys)
+                yield from worker.ready()
+            yield from worker.finish()
+        finally:
+            worker.close()
+            torch.set_num_threads(previous_threads)
+
+
+    def stream_long_speech(
+        self,
+        text: str,
+        speaker_id:Optional[Voice]  = Adama,
+        max_chars: int = 200,
+        batch_size: int = 8,
+        pauses: Optional[Dict[str, float]] = None,
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+    ) -> Iterator[np.ndarray]:
+
+        """
+        Generate speech for a text of any length, such as a whole document, segment by segment.
+
+        The text is split into sentences and clauses of at most `max_chars` characters (see
+        `split_text`), which are synthesized in batches of `batch_size` with LM sampling and vocoding
+        overlapped. A pause is inserted after each segment, by the boundary that ends it.
+
+        Args:
+            text (str): Input text in Bambara to convert to speech.
+            speaker_id (Voice, optional): Speaker or cloned voice to use (default: Adama).
+            max_chars (int): Maximum characters per segment (default: 200).
+            batch_size (int): Segments sampled together in one `generate` call (default: 8).
+            pauses (Dict[str, float], optional): Seconds of silence after a "paragraph", "sentence",
+                "clause" or "word" boundary, overriding `DEFAULT_PAUSES`.
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate per segment (default: 2048).
+
+        Yields:
+            np.ndarray: The waveform of each segment, then its pause, except after the last segment.
+        """
+
+        segments = split_text(text, max_chars=max_chars)
+        if not segments:
+            raise ValueError("text should not be empty")
+
+        pauses = {**DEFAULT_PAUSES, **(pauses or {})}
+        if any(pause < 0 for pause in pauses.values()):
+            raise ValueError("pauses can not be negative")
+
+        sample_rate = self._audio_tokenizer.config.get("sample_rate", 16000)
+        waveforms = self.generate_speech_pipelined(
+            [segment.text for segment in segments],
+            speaker_id,
+            batch_size=batch_size,
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            max_new_audio_tokens=max_new_audio_tokens,
+        )
+        for i, (segment, waveform) in enumerate(zip(segments, waveforms)):
+            yield waveform
+            num_samples = int(round(pauses[segment.boundary] * sample_rate))
+            if i < len(segments) - 1 and num_samples > 0:
+                yield np.zeros(num_samples, dtype=np.float32)
+
+
+    def generate_long_speech(
+        self,
+        text: str,
+        speaker_id:Optional[Voice]  = Adama,
+        max_chars: int = 200,
+        batch_size: int = 8,
+        pauses: Optional[Dict[str, float]] = None,
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+        output_filename: str = None
+    ) -> np.ndarray:
+
+        """
+        Generate speech for a text of any length as a single waveform, see `stream_long_speech`.
+
+        Args:
+            text (str): Input text in Bambara to convert to speech.
+            speaker_id (Voice, optional): Speaker or cloned voice to use (default: Adama).
+            max_chars (int): Maximum characters per segment (default: 200).
+            batch_size (int): Segments sampled together in one `generate` call (default: 8).
+            pauses (Dict[str, float], optional): Seconds of silence after a "paragraph", "sentence",
+                "clause" or "word" boundary, overriding `DEFAULT_PAUSES`.
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate per segment (default: 2048).
+            output_filename (str, optional): Name of output audio file.
+
+        Returns:
+            np.ndarray: Generated waveform as a NumPy array.
+        """
+
+        generated_waveform = np.concatenate([
+            np.atleast_1d(chunk).astype(np.float32, copy=False)
+            for chunk in self.stream_long_speech(
+                text,
+                speaker_id,
+                max_chars=max_chars,
+                batch_size=batch_size,
+                pauses=pauses,
+                temperature=temperature,
+                top_k=top_k,
+                top_p=top_p,
+                max_new_audio_tokens=max_new_audio_tokens,
+            )
+        ])
+
+        if generated_waveform.size > 0 and output_filename:
+            sample_rate = self._audio_tokenizer.config.get("sample_rate", 16000)
+            with self._metrics.stage("file_write"):
+                sf.write(output_filename, generated_waveform, sample_rate)
+
+        return generated_waveform
+
+
+    def stream_speech(
+        self,
+        text: str,
+        speaker_id:Optional[Voice]  = Adama,
+        chunk_tokens: int = 40,
+        overlap_tokens: int = 8,
+        temperature: float = 0.8,
+        top_k: int = 50,
+        top_p: float = 1.0,
+        max_new_audio_tokens: int = 2048,
+    ) -> Iterator[np.ndarray]:
+
+        """
+        Generate speech from text chunk by chunk, while the model is still sampling.
+
+        Args:
+            text (str): Input text in Bambara to convert to speech.
+            speaker_id (Voice, optional): Speaker or cloned voice to use (default: Adama).
+            chunk_tokens (int): Semantic tokens per emitted chunk, 50 tokens per second of audio (default: 40).
+            overlap_tokens (int): Semantic tokens cross-faded between consecutive chunks (default: 8).
+            temperature (float): Sampling temperature (default: 0.8).
+            top_k (int): Top-k sampling parameter (default: 50).
+            top_p (float): Top-p sampling parameter (default: 1.0).
+            max_new_audio_tokens (int): Maximum audio tokens to generate (default: 2048).
+
+        Yields:
+            np.ndarray: Consecutive waveform chunks; their concatenation is the full utterance.
+        """
+
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens should be positive")
+
+        if overlap_tokens < 0 or overlap_tokens >= chunk_tokens:
+            raise ValueError("overlap_tokens should be in [0, chunk_tokens)")
+
+        formatted_text = self._format_text(text, speaker_id)
+        yield from self._stream_speech_from_text(
+            text=formatted_text,
+            chunk_tokens=chunk_tokens,
+            overlap_tokens=overlap_tokens,
+            temperature=temperature,
+            top_k=top_k,
+            top_p=top_p,
+            max_new_audio_tokens=max_new_audio_tokens,
+            speaker_key=speaker_id.id if speaker_id else None
+        )
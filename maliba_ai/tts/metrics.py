@@ -0,0 +1,45 @@
+import torch
+
+from typing import Optional
+from transformers import LogitsProcessor
+
+from maliba_ai.sparktts.utils.metrics import NULL_METRICS, Metrics, NullMetrics, StageRecord
+
+
+__all__ = ["NULL_METRICS", "GenerationStageProcessor", "Metrics", "NullMetrics", "StageRecord"]
+
+
+class GenerationStageProcessor(LogitsProcessor):
+    """
+    Logits processor splitting a `generate` call into the "prefill" and "decode" stages of a metrics object.
+
+    The prefill stage starts when the processor is built, right before `generate`. The first call
+    comes with the logits of the prompt, so it ends the prefill stage (i.e. prefill includes the
+    first sampled token) and starts the decode stage, which counts one token per row and step
+    until `close` is called after `generate`.
+    """
+
+    def __init__(self, metrics: Metrics, prefill_tokens: int = 0):
+        """
+        Args:
+            metrics (Metrics): Metrics the stages are recorded in.
+            prefill_tokens (int): Prompt tokens the model runs on, i.e. not already in the KV cache.
+        """
+        self.metrics = metrics
+        self._stage: Optional[StageRecord] = metrics.start_stage("prefill", tokens=prefill_tokens)
+        self._decoding = False
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        if self._decoding:
+            self._stage.tokens += input_ids.shape[0]
+        elif self._stage is not None:
+            self.metrics.end_stage(self._stage)
+            self._stage = self.metrics.start_stage("decode")
+            self._decoding = True
+        return scores
+
+    def close(self) -> None:
+        """End the running stage, also when `generate` failed before the first decode step."""
+        if self._stage is not None:
+            self.metrics.end_stage(self._stage)
+            self._stage = None
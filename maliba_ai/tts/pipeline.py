@@ -0,0 +1,102 @@
+import queue
+import threading
+import numpy as np
+
+from typing import Callable, Iterator, List
+
+
+class VocoderWorker:
+    """
+    Background thread running the vocoder stage of a synthesis pipeline.
+
+    Batches of audio tokens are submitted through a bounded queue, so the producer (the LM stage)
+    blocks once `max_pending` batches wait for vocoding instead of buffering a whole job in memory.
+    Waveforms come out in submission order.
+
+    The worker shares the torch intra-op thread pool of the process: the thread count set with
+    `torch.set_num_threads` is process-wide, so it can not be budgeted per stage from here.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        vocode: Callable[..., List[np.ndarray]],
+        max_pending: int = 2,
+    ):
+        """
+        Args:
+            vocode (Callable): Function turning the submitted arguments into a list of waveforms.
+            max_pending (int): Submitted batches waiting for vocoding before `submit` blocks (default: 2).
+        """
+        self.vocode = vocode
+        self._inputs = queue.Queue(maxsize=max_pending)
+        self._outputs = queue.Queue()
+        self._cancelled = False
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name="tts-vocoder", daemon=True)
+
+
+    def start(self) -> "VocoderWorker":
+        self._thread.start()
+        return self
+
+
+    def _run(self) -> None:
+        failed = False
+        while True:
+            item = self._inputs.get()
+            if item is self._STOP:
+                self._outputs.put(self._STOP)
+                return
+            # keep draining the inputs after a failure so that the producer never blocks
+            if failed or self._cancelled:
+                continue
+            try:
+                self._outputs.put(self.vocode(*item))
+            except Exception as error:
+                failed = True
+                self._outputs.put(error)
+
+
+    def submit(self, *args) -> None:
+        """Queue one batch for vocoding, blocking while `max_pending` batches are already queued."""
+        self._inputs.put(args)
+
+
+    def _unpack(self, item) -> List[np.ndarray]:
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+
+    def ready(self) -> Iterator[np.ndarray]:
+        """Waveforms of the batches vocoded so far, without waiting for the others."""
+        while True:
+            try:
+                item = self._outputs.get_nowait()
+            except queue.Empty:
+                return
+            yield from self._unpack(item)
+
+
+    def finish(self) -> Iterator[np.ndarray]:
+        """Waveforms of all remaining batches, waiting for the worker to vocode them."""
+        self._stopping = True
+        self._inputs.put(self._STOP)
+        while True:
+            item = self._outputs.get()
+            if item is self._STOP:
+                return
+            yield from self._unpack(item)
+
+
+    def close(self) -> None:
+        """Stop the worker, dropping the batches that were not vocoded yet."""
+        if not self._thread.is_alive():
+            return
+        self._cancelled = True
+        if not self._stopping:
+            self._stopping = True
+            self._inputs.put(self._STOP)
+        self._thread.join()
@@ -0,0 +1,94 @@
+import os
+import torch
+
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from maliba_ai.sparktts.models.bicodec import PreparedSpeaker
+
+
+@dataclass
+class SpeakerEntry:
+    """Cached speaker conditioning.
+
+    Args:
+        global_tokens (torch.Tensor): BiCodec global token indices. shape: (token_num,)
+        d_vector (torch.Tensor): Speaker embedding decoded from the global tokens. shape: (1, out_dim)
+        prepared (PreparedSpeaker, optional): Decoder conditioning, built on first use and not persisted.
+    """
+
+    global_tokens: torch.Tensor
+    d_vector: torch.Tensor
+    prepared: Optional[PreparedSpeaker] = field(default=None, repr=False)
+
+
+class SpeakerCache:
+    """
+    Cache of BiCodec global tokens and d-vectors, one entry per speaker.
+
+    Global tokens carry the voice identity of a speaker, so once they are known the
+    prompt can be prefilled with them and generation can start at the semantic tokens.
+    When a path is given, the cache is loaded from it at creation time and saved to it
+    after every new entry.
+    """
+
+    def __init__(self, path: Optional[str] = None, device: Optional[torch.device] = None):
+        """
+        Args:
+            path (str, optional): File the cache is persisted to.
+            device (torch.device, optional): Device the cached tensors are kept on.
+        """
+        self.path = path
+        self.device = device or torch.device("cpu")
+        self._entries: Dict[str, SpeakerEntry] = {}
+        if path and os.path.exists(path):
+            self.load()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[SpeakerEntry]:
+        return self._entries.get(key)
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    def put(
+        self,
+        key: str,
+        global_tokens: torch.Tensor,
+        d_vector: torch.Tensor,
+        prepared: Optional[PreparedSpeaker] = None,
+    ) -> SpeakerEntry:
+        """Add or replace the entry of a speaker, then persist the cache if it has a path."""
+        entry = SpeakerEntry(
+            global_tokens=global_tokens.detach().reshape(-1).long().to(self.device),
+            d_vector=d_vector.detach().reshape(1, -1).to(self.device),
+            prepared=prepared,
+        )
+        self._entries[key] = entry
+        if self.path:
+            self.save()
+        return entry
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        if not path:
+            raise ValueError("no path to save the speaker cache to")
+        state = {
+            key: {"global_tokens": entry.global_tokens.cpu(), "d_vector": entry.d_vector.cpu()}
+            for key, entry in self._entries.items()
+        }
+        torch.save(state, path)
+
+    def load(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        state = torch.load(path, map_location="cpu", weights_only=True)
+        for key, entry in state.items():
+            self._entries[key] = SpeakerEntry(
+                global_tokens=entry["global_tokens"].to(self.device),
+                d_vector=entry["d_vector"].to(self.device),
+            )
@@ -0,0 +1,82 @@
+import queue
+import torch
+import numpy as np
+
+from typing import Iterator, List
+from transformers import StoppingCriteria
+from transformers.generation.streamers import BaseStreamer
+
+
+class TokenIdStreamer(BaseStreamer):
+    """
+    Streamer handing the ids produced by `model.generate` over to another thread.
+
+    `generate` runs in a background thread and calls `put` once with the prompt and then
+    once per decoding step; the consumer iterates over the streamer to receive the new ids
+    as plain lists (one id per batch row).
+    """
+
+    _STOP = object()
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._prompt_seen = False
+        self._cancelled = False
+
+    def put(self, value: torch.Tensor) -> None:
+        if not self._prompt_seen:
+            self._prompt_seen = True
+            return
+        self._queue.put(value.reshape(-1).tolist())
+
+    def end(self) -> None:
+        self._queue.put(self._STOP)
+
+    def fail(self, error: BaseException) -> None:
+        """Forward an exception raised by the generation thread to the consumer."""
+        self._queue.put(error)
+
+    def cancel(self) -> None:
+        """Ask the generation thread to stop at the next decoding step."""
+        self._cancelled = True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def __iter__(self) -> Iterator[List[int]]:
+        while True:
+            item = self._queue.get()
+            if item is self._STOP:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+class StreamerCancelCriteria(StoppingCriteria):
+    """Stopping criteria ending generation once the consumer cancelled the streamer."""
+
+    def __init__(self, streamer: TokenIdStreamer):
+        self.streamer = streamer
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full(
+            (input_ids.shape[0],), self.streamer.cancelled, dtype=torch.bool, device=input_ids.device
+        )
+
+
+def crossfade(tail: np.ndarray, head: np.ndarray) -> np.ndarray:
+    """
+    Linearly cross-fade two renderings of the same audio segment.
+
+    Args:
+        tail (np.ndarray): End of the previous chunk, faded out.
+        head (np.ndarray): Start of the next chunk, faded in.
+
+    Returns:
+        np.ndarray: The blended segment.
+    """
+    length = min(len(tail), len(head))
+    fade_in = np.linspace(0.0, 1.0, length, dtype=np.float32)
+    return tail[:length] * (1.0 - fade_in) + head[:length] * fade_in
@@ -0,0 +1,112 @@
+import re
+
+from dataclasses import dataclass
+from typing import Dict, List
+
+
+# strongest boundary first: a segment ending a paragraph also ends a sentence
+PARAGRAPH = "paragraph"
+SENTENCE = "sentence"
+CLAUSE = "clause"
+WORD = "word"
+
+# seconds of silence inserted after a segment, by the boundary that ends it
+DEFAULT_PAUSES: Dict[str, float] = {PARAGRAPH: 0.7, SENTENCE: 0.35, CLAUSE: 0.15, WORD: 0.0}
+
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+# sentence ends, possibly followed by a closing quote or bracket
+_SENTENCE_END = re.compile(r"(?<=[.!?…])\s+|(?<=[.!?…][\"'»”’)\]])\s+")
+_CLAUSE_END = re.compile(r"(?<=[,;:])\s+|\s+(?=[–—]\s)")
+
+
+@dataclass
+class TextSegment:
+    """A unit of text synthesized with one prompt, and the kind of boundary that ends it."""
+
+    text: str
+    boundary: str
+
+
+def _split_words(text: str, max_chars: int) -> List[str]:
+    """Greedily pack words into pieces of at most `max_chars` characters."""
+    pieces: List[str] = []
+    current = ""
+    for word in text.split():
+        if current and len(current) + 1 + len(word) > max_chars:
+            pieces.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def _pack(units: List[str], max_chars: int) -> List[str]:
+    """Merge consecutive units as long as the result fits in `max_chars` characters."""
+    pieces: List[str] = []
+    for unit in units:
+        if pieces and len(pieces[-1]) + 1 + len(unit) <= max_chars:
+            pieces[-1] = f"{pieces[-1]} {unit}"
+        else:
+            pieces.append(unit)
+    return pieces
+
+
+def _split_sentence(sentence: str, max_chars: int) -> List[TextSegment]:
+    if len(sentence) <= max_chars:
+        return [TextSegment(sentence, SENTENCE)]
+
+    segments: List[TextSegment] = []
+    clauses = [clause for clause in _CLAUSE_END.split(sentence) if clause.strip()]
+    for clause in _pack(clauses, max_chars):
+        if len(clause) <= max_chars:
+            segments.append(TextSegment(clause, CLAUSE))
+        else:
+            segments.extend(TextSegment(piece, WORD) for piece in _split_words(clause, max_chars))
+    segments[-1].boundary = SENTENCE
+    return segments
+
+
+def split_text(text: str, max_chars: int = 200, min_chars: int = 20) -> List[TextSegment]:
+    """
+    Split a Bambara text into segments short enough to be synthesized with one prompt.
+
+    The text is cut at paragraph breaks and sentence ends first. Sentences longer than `max_chars`
+    are cut at clause punctuation (`,` `;` `:` and dashes), and clauses still too long between
+    words. Sentences shorter than `min_chars`, such as interjections, are merged with the next
+    sentence of their paragraph so that the model is not prompted with a single word.
+
+    Args:
+        text (str): Input text in Bambara.
+        max_chars (int): Maximum characters per segment, unless a single word is longer (default: 200).
+        min_chars (int): Sentences shorter than this are merged with the next one (default: 20).
+
+    Returns:
+        List[TextSegment]: Segments in reading order, each with the boundary that ends it:
+            "paragraph", "sentence", "clause" or "word".
+    """
+    if max_chars <= 0:
+        raise ValueError("max_chars should be positive")
+
+    segments: List[TextSegment] = []
+    for paragraph in _PARAGRAPH_BREAK.split(text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+
+        sentences: List[str] = []
+        for sentence in _SENTENCE_END.split(paragraph):
+            sentence = sentence.strip()
+            if not sentence:
+                continue
+            if sentences and len(sentences[-1]) < min_chars and len(sentences[-1]) + 1 + len(sentence) <= max_chars:
+                sentences[-1] = f"{sentences[-1]} {sentence}"
+            else:
+                sentences.append(sentence)
+
+        for sentence in sentences:
+            segments.extend(_split_sentence(sentence, max_chars))
+        segments[-1].boundary = PARAGRAPH
+
+    return segments
@@ -0,0 +1,94 @@
+import re
+import torch
+
+from typing import Dict, List, Tuple
+from transformers import PreTrainedTokenizerBase
+
+
+SEMANTIC_TOKEN_PATTERN = re.compile(r"^<\|bicodec_semantic_(\d+)\|>$")
+GLOBAL_TOKEN_PATTERN = re.compile(r"^<\|bicodec_global_(\d+)\|>$")
+
+
+class BiCodecTokenMap:
+    """
+    Precomputed lookup tables mapping LM token ids to BiCodec codebook indices.
+
+    Each table has one entry per vocabulary id holding the codebook index of
+    `<|bicodec_semantic_N|>` / `<|bicodec_global_N|>`, or -1 for any other token, so
+    generated ids are converted with a single gather instead of decoding them to text.
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase):
+        """
+        Args:
+            tokenizer: Tokenizer of the TTS model.
+        """
+        vocab = tokenizer.get_vocab()
+        # the last slot stays at -1 and absorbs ids beyond the tokenizer vocabulary
+        self.vocab_size = max(vocab.values()) + 1
+        semantic_table = torch.full((self.vocab_size + 1,), -1, dtype=torch.long)
+        global_table = torch.full((self.vocab_size + 1,), -1, dtype=torch.long)
+
+        for token, token_id in vocab.items():
+            match = SEMANTIC_TOKEN_PATTERN.match(token)
+            if match:
+                semantic_table[token_id] = int(match.group(1))
+                continue
+            match = GLOBAL_TOKEN_PATTERN.match(token)
+            if match:
+                global_table[token_id] = int(match.group(1))
+
+        self._tables: Dict[torch.device, Tuple[torch.Tensor, torch.Tensor]] = {
+            torch.device("cpu"): (semantic_table, global_table)
+        }
+
+    def _get_tables(self, device: torch.device) -> Tuple[torch.Tensor, torch.Tensor]:
+        if device not in self._tables:
+            semantic_table, global_table = self._tables[torch.device("cpu")]
+            self._tables[device] = (semantic_table.to(device), global_table.to(device))
+        return self._tables[device]
+
+    def lookup(self, generated_ids: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Map token ids to codebook indices, element-wise.
+
+        Args:
+            generated_ids (torch.Tensor): Token ids of any shape.
+
+        Returns:
+            tuple: (global_indices, semantic_indices), same shape as `generated_ids`,
+                -1 where the id is not a global / semantic token.
+        """
+        semantic_table, global_table = self._get_tables(generated_ids.device)
+        ids = generated_ids.clamp(0, self.vocab_size)
+        return global_table[ids], semantic_table[ids]
+
+    def extract(self, generated_ids: torch.Tensor) -> Tuple[torch.Tensor, torch.Tensor]:
+        """
+        Extract the global and semantic codebook indices of one generated sequence.
+
+        Args:
+            generated_ids (torch.Tensor): Generated ids. shape: (seq_len,)
+
+        Returns:
+            tuple: (global_indices, semantic_indices) in generation order.
+        """
+        global_indices, semantic_indices = self.lookup(generated_ids)
+        return global_indices[global_indices >= 0], semantic_indices[semantic_indices >= 0]
+
+    def extract_batch(self, generated_ids: torch.Tensor) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        """
+        Extract the global and semantic codebook indices of a batch of generated sequences.
+
+        Args:
+            generated_ids (torch.Tensor): Generated ids, padding allowed. shape: (batch_size, seq_len)
+
+        Returns:
+            list: One (global_indices, semantic_indices) pair per row.
+        """
+        global_indices, semantic_indices = self.lookup(generated_ids)
+        global_mask = global_indices >= 0
+        semantic_mask = semantic_indices >= 0
+        global_rows = torch.split(global_indices[global_mask], global_mask.sum(dim=1).tolist())
+        semantic_rows = torch.split(semantic_indices[semantic_mask], semantic_mask.sum(dim=1).tolist())
+        return list(zip(global_rows, semantic_rows))